@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from vdv2geojson.batch import find_batch_jobs
+
+########################################################################################################################
+# Tests for naming the outputs of batch jobs, which must not overwrite each other.
+########################################################################################################################
+
+def _create_inputs(tmp_path, names):
+    for name in names:
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        (tmp_path / name).write_bytes(b'')
+
+def test_outputs_are_named_after_inputs(tmp_path):
+    _create_inputs(tmp_path, ['a.zip', 'b.zip'])
+
+    jobs = find_batch_jobs([str(tmp_path / '*.zip')], 'out')
+
+    assert jobs == [(str(tmp_path / 'a.zip'), os.path.join('out', 'a.zip')), (str(tmp_path / 'b.zip'), os.path.join('out', 'b.zip'))]
+
+def test_inputs_of_the_same_name_are_named_after_their_path(tmp_path):
+    _create_inputs(tmp_path, ['op1/export.zip', 'op2/export.zip', 'other/2024/export.zip', 'other/single.zip'])
+
+    jobs = find_batch_jobs([str(tmp_path / 'op*' / 'export.zip'), str(tmp_path / 'other' / '*' / 'export.zip'), str(tmp_path / 'other' / '*.zip')], 'out')
+
+    assert [output for input, output in jobs] == [
+        os.path.join('out', 'op1-export.zip'),
+        os.path.join('out', 'op2-export.zip'),
+        os.path.join('out', 'other-2024-export.zip'),
+        os.path.join('out', 'single.zip')
+    ]
+
+def test_duplicate_outputs_are_rejected(tmp_path):
+    _create_inputs(tmp_path, ['op1/export.zip'])
+
+    jobs_filename = tmp_path / 'jobs.txt'
+    jobs_filename.write_text(f"{tmp_path / 'op1' / 'export.zip'} out/export.zip\n")
+
+    with pytest.raises(ValueError):
+        find_batch_jobs([str(tmp_path / 'op1' / 'export.zip')], 'out', str(jobs_filename))
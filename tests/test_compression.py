@@ -0,0 +1,74 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from vdv2geojson import compression
+from vdv2geojson.compression import COMPRESSION_METHODS
+from vdv2geojson.compression import ParallelCompressor
+from vdv2geojson.compression import compress_gzip
+from vdv2geojson.compression import compress_zip_member
+from vdv2geojson.compression import create_zip_member
+from vdv2geojson.compression import write_zip_member
+
+########################################################################################################################
+# Round-trip tests for ZIP members and gzip files compressed in parallel threads.
+########################################################################################################################
+
+MEMBERS = [(f"{i}-1-V{i}.geojson", (f'{{"type":"FeatureCollection","features":[{i}]}}' * (i * 50)).encode('utf-8')) for i in range(1, 20)] + [('empty.geojson', b'')]
+
+@pytest.mark.parametrize('raw_zip_members', [True, False])
+@pytest.mark.parametrize('num_threads', [1, 4])
+@pytest.mark.parametrize('method', sorted(COMPRESSION_METHODS.keys()))
+def test_zip_round_trip(monkeypatch, method, num_threads, raw_zip_members):
+    if raw_zip_members and not compression._RAW_ZIP_MEMBERS:
+        pytest.skip('ZipFile internals are not available')
+
+    monkeypatch.setattr(compression, '_RAW_ZIP_MEMBERS', raw_zip_members)
+
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', COMPRESSION_METHODS[method]) as zip_file:
+        compressor = ParallelCompressor(num_threads, 2)
+        for filename, data in MEMBERS:
+            zip_info = create_zip_member(zip_file, filename)
+            compressor.submit(lambda d, z=zip_info: compress_zip_member(z, d), data, lambda c, z=zip_info: write_zip_member(zip_file, z, c))
+
+        compressor.close()
+
+    with zipfile.ZipFile(io.BytesIO(zip_buffer.getvalue()), 'r') as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == [filename for filename, data in MEMBERS]
+
+        for filename, data in MEMBERS:
+            assert zip_file.getinfo(filename).compress_type == COMPRESSION_METHODS[method]
+            assert zip_file.read(filename) == data
+
+def test_gzip_round_trip():
+    for filename, data in MEMBERS:
+        compressed_data = compress_gzip(data, 6)
+
+        assert gzip.decompress(compressed_data) == data
+        assert compressed_data == compress_gzip(data, 6)
+
+def test_zip_member_not_written_into_open_member():
+    if not compression._RAW_ZIP_MEMBERS:
+        pytest.skip('ZipFile internals are not available')
+
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_info = create_zip_member(zip_file, 'routes.geojson')
+        compressed_data = compress_zip_member(zip_info, MEMBERS[0][1])
+
+        with zip_file.open('streamed.geojson', 'w') as member_file:
+            member_file.write(MEMBERS[1][1])
+
+            with pytest.raises(ValueError):
+                write_zip_member(zip_file, zip_info, compressed_data)
+
+        write_zip_member(zip_file, zip_info, compressed_data)
+
+    with zipfile.ZipFile(io.BytesIO(zip_buffer.getvalue()), 'r') as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.read('streamed.geojson') == MEMBERS[1][1]
+        assert zip_file.read('routes.geojson') == MEMBERS[0][1]
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import json
+
+from vdv2geojson.geojson import round_feature_coordinates
+from vdv2geojson.tiles import TilePyramidWriter
+
+########################################################################################################################
+# Tests for writing tiles with rounded coordinates, where clipped routes become multi-part geometries.
+########################################################################################################################
+
+def _write_tiles(features, coordinate_precision):
+    tiles = dict()
+
+    @contextlib.contextmanager
+    def open_file(filename):
+        tile_file = io.StringIO()
+        yield tile_file
+        tiles[filename] = json.loads(tile_file.getvalue())
+
+    tile_writer = TilePyramidWriter(open_file, 10, 10, 0.0, 0, 'tiles', coordinate_precision)
+    for feature in features:
+        tile_writer.write_feature(feature)
+
+    tile_writer.close()
+
+    return tiles
+
+def _route_feature(coordinates):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'LineString', 'coordinates': coordinates},
+        'properties': {'name': 'route'}
+    }
+
+def test_round_multi_part_coordinates():
+    feature = {
+        'type': 'Feature',
+        'geometry': {'type': 'MultiLineString', 'coordinates': [[[7.1234567, 51.1234567], [7.2, 51.2], [7.3, 51.3]], [[7.4, 51.4], [7.5123456, 51.5123456]]]},
+        'properties': dict()
+    }
+
+    rounded_feature = round_feature_coordinates(feature, 3)
+
+    assert rounded_feature['geometry']['coordinates'] == [[[7.123, 51.123], [7.2, 51.2], [7.3, 51.3]], [[7.4, 51.4], [7.512, 51.512]]]
+    assert feature['geometry']['coordinates'][0][0] == [7.1234567, 51.1234567]
+
+def test_tiles_with_coordinate_precision():
+    # the route leaves the tile of its start and enters it again, so this tile gets parts of different lengths
+    coordinates = [[7.0001234, 51.0001234], [7.0101234, 51.0051234], [7.0201234, 51.0081234], [7.1, 51.0101234], [7.2, 51.0101234], [7.6, 51.0101234], [7.2, 51.0201234], [7.1, 51.0201234], [7.0101234, 51.0201234]]
+
+    tiles = _write_tiles([_route_feature(coordinates)], 5)
+    unrounded_tiles = _write_tiles([_route_feature(coordinates)], None)
+
+    assert tiles.keys() == unrounded_tiles.keys()
+    assert any(f['geometry']['type'] == 'MultiLineString' for tile in tiles.values() for f in tile['features'])
+
+    for tile_filename, tile in tiles.items():
+        for feature, unrounded_feature in zip(tile['features'], unrounded_tiles[tile_filename]['features']):
+            assert feature['geometry'] == round_feature_coordinates(unrounded_feature, 5)['geometry']
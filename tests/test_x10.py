@@ -0,0 +1,158 @@
+import io
+
+import pytest
+
+from vdv2geojson.x10 import X10File
+from vdv2geojson.x10 import read_x10_file
+
+########################################################################################################################
+# Regression tests comparing the lookup, add and remove semantics of X10File with the original linear scans.
+########################################################################################################################
+
+X10_CONTENT = '''mod; DD.MM.YYYY; HH:MM:SS; free
+tbl; LID_VERLAUF
+atr; LI_LFD_NR; LI_NR; STR_LI_VAR; ORT_NR
+frm; num[3.0]; num[6.0]; char[6]; num[6.0]
+rec; 1; 2; "V1"; 31
+rec; 2; 2; "V1"; 24
+rec; 1; 3; "V2"; 16
+rec; 2; 3; "V2"; 18
+rec; 1; 2; "V3"; 31
+end; 5
+eof; 1
+'''
+
+PRIMARY_KEY = ['LI_NR', 'STR_LI_VAR']
+
+def _read(storage='rows'):
+    return read_x10_file(io.StringIO(X10_CONTENT), 'NULL', 'utf-8', storage=storage)
+
+def _dicts(records):
+    return [dict(r) for r in records]
+
+def _compare_record(record, primary_key):
+    # the original comparison, reducing a record to the primary key fields it contains
+    if primary_key is None:
+        return dict(record)
+
+    return {k: v for k, v in record.items() if k in primary_key}
+
+def _reference_find_records(records, rdata, primary_key):
+    rdata = _compare_record(rdata, primary_key)
+    return [dict(r) for r in records if _compare_record(r, primary_key) == rdata]
+
+def _reference_add_records(records, new_records, primary_key):
+    records = _dicts(records)
+    for rdata in new_records:
+        record_pkfields = _compare_record(rdata, primary_key)
+        if not any(_compare_record(r, primary_key) == record_pkfields for r in records):
+            records.append(dict(rdata))
+
+    return records
+
+def _reference_remove_records(records, rdata, primary_key):
+    return [dict(r) for r in records if _compare_record(r, primary_key) != dict(rdata)]
+
+@pytest.mark.parametrize('storage', ['rows', 'columns'])
+@pytest.mark.parametrize('indexed', [False, True])
+def test_find_records(storage, indexed):
+    x10_file = _read(storage)
+    if indexed:
+        x10_file.create_index(PRIMARY_KEY)
+
+    for rdata in ({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, {'LI_NR': 3, 'STR_LI_VAR': 'V2'}, {'LI_NR': 4, 'STR_LI_VAR': 'V1'}):
+        expected = _reference_find_records(_read().records, rdata, PRIMARY_KEY)
+
+        assert _dicts(x10_file.find_records(rdata, PRIMARY_KEY)) == expected
+
+        record = x10_file.find_record(rdata, PRIMARY_KEY)
+        assert (dict(record) if record is not None else None) == (expected[0] if len(expected) > 0 else None)
+
+def test_no_index_is_created_implicitly():
+    x10_file = _read()
+    x10_file.find_records({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, PRIMARY_KEY)
+
+    assert x10_file._indexes == dict()
+
+@pytest.mark.parametrize('storage', ['rows', 'columns'])
+def test_find_records_after_changing_records(storage):
+    x10_file = _read(storage)
+
+    record = x10_file.find_record({'LI_NR': 3, 'STR_LI_VAR': 'V2'}, PRIMARY_KEY)
+    record['STR_LI_VAR'] = 'V1'
+
+    if storage == 'rows':
+        x10_file.records.append({'LI_LFD_NR': 3, 'LI_NR': 2, 'STR_LI_VAR': 'V1', 'ORT_NR': 40})
+
+    for rdata in ({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, {'LI_NR': 3, 'STR_LI_VAR': 'V1'}, {'LI_NR': 3, 'STR_LI_VAR': 'V2'}):
+        assert _dicts(x10_file.find_records(rdata, PRIMARY_KEY)) == _reference_find_records(x10_file.records, rdata, PRIMARY_KEY)
+
+@pytest.mark.parametrize('storage', ['rows', 'columns'])
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('primary_key', [None, ['LI_NR', 'LI_LFD_NR']])
+def test_add_records(storage, indexed, primary_key):
+    x10_file = _read(storage)
+    if indexed:
+        x10_file.create_index(PRIMARY_KEY)
+
+    new_records = [
+        {'LI_LFD_NR': 1, 'LI_NR': 2, 'STR_LI_VAR': 'V1', 'ORT_NR': 31},
+        {'LI_LFD_NR': 1, 'LI_NR': 2, 'STR_LI_VAR': 'V1', 'ORT_NR': 99},
+        {'LI_LFD_NR': 3, 'LI_NR': 2, 'STR_LI_VAR': 'V1', 'ORT_NR': 40},
+        {'LI_LFD_NR': 3, 'LI_NR': 2, 'STR_LI_VAR': 'V1', 'ORT_NR': 40},
+        {'LI_LFD_NR': 1, 'LI_NR': 4, 'STR_LI_VAR': 'V4', 'ORT_NR': 7}
+    ]
+
+    expected = _reference_add_records(_read().records, new_records, primary_key)
+    num_added = x10_file.add_records(new_records, primary_key)
+
+    assert _dicts(x10_file.records) == expected
+    assert num_added == len(expected) - 5
+
+    for rdata in ({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, {'LI_NR': 4, 'STR_LI_VAR': 'V4'}):
+        assert _dicts(x10_file.find_records(rdata, PRIMARY_KEY)) == _reference_find_records(expected, rdata, PRIMARY_KEY)
+
+@pytest.mark.parametrize('storage', ['rows', 'columns'])
+@pytest.mark.parametrize('indexed', [False, True])
+@pytest.mark.parametrize('rdata, primary_key', [
+    ({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, PRIMARY_KEY),
+    ({'LI_NR': 2}, ['LI_NR']),
+    ({'LI_NR': 2, 'ORT_NR': 31}, ['LI_NR']),
+    ({'LI_LFD_NR': 1, 'LI_NR': 3, 'STR_LI_VAR': 'V2', 'ORT_NR': 16}, None)
+])
+def test_remove_records(storage, indexed, rdata, primary_key):
+    x10_file = _read(storage)
+    if indexed:
+        x10_file.create_index(PRIMARY_KEY)
+
+    expected = _reference_remove_records(_read().records, rdata, primary_key)
+    num_removed = x10_file.remove_records(rdata, primary_key)
+
+    assert _dicts(x10_file.records) == expected
+    assert num_removed == 5 - len(expected)
+
+    for rdata in ({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, {'LI_NR': 3, 'STR_LI_VAR': 'V2'}):
+        assert _dicts(x10_file.find_records(rdata, PRIMARY_KEY)) == _reference_find_records(expected, rdata, PRIMARY_KEY)
+
+@pytest.mark.parametrize('storage', ['rows', 'columns'])
+def test_replace_foreign_keys_updates_index(storage):
+    x10_file = _read(storage)
+    x10_file.create_index(PRIMARY_KEY)
+
+    assert x10_file.replace_foreign_keys(['STR_LI_VAR'], {'V1': 'V9'})
+
+    assert _dicts(x10_file.find_records({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, PRIMARY_KEY)) == list()
+    assert [r['LI_LFD_NR'] for r in x10_file.find_records({'LI_NR': 2, 'STR_LI_VAR': 'V9'}, PRIMARY_KEY)] == [1, 2]
+
+def test_new_x10_file():
+    x10_file = X10File()
+
+    assert x10_file.auto_index is False
+    assert x10_file.find_records({'LI_NR': 2}, ['LI_NR']) == list()
+
+def test_column_index_stores_row_numbers():
+    x10_file = _read('columns')
+    index = x10_file.create_index(PRIMARY_KEY)
+
+    assert index[(2, 'V1')] == [0, 1]
+    assert [r.row for r in x10_file.find_records({'LI_NR': 2, 'STR_LI_VAR': 'V1'}, PRIMARY_KEY)] == [0, 1]
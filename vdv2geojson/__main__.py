@@ -1,8 +1,16 @@
 import click
+import json
 import logging
 import os
+import shutil
+import tempfile
+import time
 
+from vdv2geojson.batch import find_batch_jobs
+from vdv2geojson.batch import format_batch_results
+from vdv2geojson.batch import run_batch
 from vdv2geojson.converter import VdvGeoJsonConverter
+from vdv2geojson.server import RouteServer
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -10,12 +18,28 @@ logging.basicConfig(
     datefmt='%H:%M:%S'
 )
 
-@click.command
+@click.group(invoke_without_command=True)
 @click.option('--input', default='./input', help='input directory or ZIP file')
 @click.option('--output', default='./output', help='output directory or ZIP file')
 @click.option('--lines', default=None, help='comma-separated line IDs to be processed; if None, all lines are processed')
 @click.option('--config', default=None, help='additional config file')
-def main(input, output, lines, config):
+@click.option('--cache', default=None, help='directory for caching parsed tables between runs; if None, caching is disabled')
+@click.option('--workers', default=1, type=int, help='number of worker processes for converting routes in parallel')
+@click.option('--output-mode', default=None, type=click.Choice(['files', 'collection', 'ndjson', 'geojsonseq', 'tiles', 'topojson']), help='one GeoJSON file per route, one combined feature collection, newline-delimited GeoJSON, GeoJSON text sequences, a z/x/y pyramid of GeoJSON tiles or a TopoJSON topology with shared section arcs; if None, the config value is used')
+@click.option('--incremental', is_flag=True, default=None, help='convert only routes whose input data changed since the last run, based on the manifest in the output directory')
+@click.option('--stats', default=None, help='JSON file for per-stage timings, memory usage and counters of the conversion')
+@click.option('--log-routes/--no-log-routes', default=None, help='log the progress of each route; if None, the config value is used')
+@click.option('--low-memory/--no-low-memory', default=None, help='stream routes from sorted files and disk-backed indexes instead of keeping all tables in memory; if None, the config value is used')
+@click.option('--compression', default=None, type=click.Choice(['stored', 'deflated', 'bzip2', 'lzma']), help='compression method of output ZIP archives; if None, the config value is used')
+@click.option('--compression-level', default=None, type=int, help='compression level of output ZIP archives and GZIP files; if None, the config value is used')
+@click.option('--compression-threads', default=None, type=int, help='number of threads compressing output files in parallel; if None, the config value or the number of CPUs is used')
+@click.option('--gzip/--no-gzip', 'gzip_output', default=None, help='write pre-compressed *.gz files into the output directory; if None, the config value is used')
+@click.pass_context
+def main(ctx, input, output, lines, config, cache, workers, output_mode, incremental, stats, log_routes, low_memory, compression, compression_level, compression_threads, gzip_output):
+    # without a sub command the whole dataset is converted once
+    if ctx.invoked_subcommand is not None:
+        return
+
     if not lines is None:
         if os.path.isfile(lines):
             with open(lines, 'r') as lines_file:
@@ -27,8 +51,66 @@ def main(input, output, lines, config):
     else:
         line_filter = []
     
-    converter = VdvGeoJsonConverter(config)
+    converter = VdvGeoJsonConverter(config, cache_directory=cache, workers=workers, output_mode=output_mode, incremental=incremental, stats_filename=stats, log_routes=log_routes, low_memory=low_memory, compression=compression, compression_level=compression_level, compression_threads=compression_threads, gzip_output=gzip_output)
     converter.convert(input, output, line_filter)
 
+@main.command(help='serve the GeoJSON of single lines and routes over HTTP from data loaded once')
+@click.option('--input', default='./input', help='input directory or ZIP file')
+@click.option('--config', default=None, help='additional config file')
+@click.option('--cache', default=None, help='directory for caching parsed tables between runs; if None, caching is disabled')
+@click.option('--host', default='127.0.0.1', help='address to listen on')
+@click.option('--port', default=8080, type=int, help='port to listen on')
+@click.option('--cache-size', default=1024, type=int, help='number of simplified route features kept in memory')
+def serve(input, config, cache, host, port, cache_size):
+    converter = VdvGeoJsonConverter(config, cache_directory=cache, output_mode='files', log_routes=False)
+
+    route_server = RouteServer(converter, input, cache_size)
+    route_server.serve(host, port)
+
+@main.command(help='convert many datasets in one run, sharing one worker pool, the config and the table cache')
+@click.option('--input', 'inputs', multiple=True, help='input directory or ZIP file, may be a glob pattern and may be given multiple times')
+@click.option('--output', default='./output', help='directory for the outputs of the inputs, each one named after its input')
+@click.option('--jobs', default=None, help='file with one dataset per line, containing its input and output separated by whitespace')
+@click.option('--lines', default=None, help='comma-separated line IDs to be processed in every dataset; if None, all lines are processed')
+@click.option('--config', default=None, help='additional config file')
+@click.option('--cache', default=None, help='directory for caching parsed tables, shared by all datasets; if None, a temporary cache is used for the batch')
+@click.option('--workers', default=1, type=int, help='number of worker processes converting datasets in parallel')
+@click.option('--output-mode', default=None, type=click.Choice(['files', 'collection', 'ndjson', 'geojsonseq', 'tiles', 'topojson']), help='output mode of every dataset; if None, the config value is used')
+@click.option('--stats', default=None, help='JSON file for the throughput and statistics of each dataset')
+@click.option('--log-routes/--no-log-routes', default=None, help='log the progress of each route; if None, the config value is used')
+def batch(inputs, output, jobs, lines, config, cache, workers, output_mode, stats, log_routes):
+    try:
+        batch_jobs = find_batch_jobs(inputs, output, jobs)
+    except ValueError as ex:
+        raise click.UsageError(str(ex))
+
+    if len(batch_jobs) == 0:
+        raise click.UsageError('no datasets given, use --input or --jobs')
+
+    line_filter = [int(x.strip()) for x in lines.split(',')] if lines is not None else []
+
+    # identical tables of different datasets are parsed only once and loaded from the shared cache afterwards
+    cache_directory = cache if cache is not None else tempfile.mkdtemp(prefix='vdv2geojson-cache-')
+    try:
+        converter = VdvGeoJsonConverter(config, cache_directory=cache_directory, output_mode=output_mode, log_routes=log_routes)
+
+        start_time = time.perf_counter()
+        results = run_batch(converter, batch_jobs, workers, line_filter)
+        wall_seconds = time.perf_counter() - start_time
+    finally:
+        if cache is None:
+            shutil.rmtree(cache_directory, ignore_errors=True)
+
+    for line in format_batch_results(results, wall_seconds):
+        click.echo(line)
+
+    if stats is not None:
+        with open(stats, 'w') as stats_file:
+            json.dump(results, stats_file, indent=4)
+
+    num_failed = len([r for r in results if r['status'] != 'ok'])
+    if num_failed > 0:
+        raise click.ClickException(f"{num_failed} of {len(results)} datasets could not be converted")
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
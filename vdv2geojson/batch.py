@@ -0,0 +1,184 @@
+import glob
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+
+from vdv2geojson.source import file_content_hash
+from vdv2geojson.source import zip_member_content_hash
+
+########################################################################################################################
+# Batch conversion of many datasets in one process, sharing one worker pool, the parsed config and the table cache.
+########################################################################################################################
+
+_batch_converter = None
+
+def find_batch_jobs(inputs, output_directory, jobs_filename=None):
+    # each input matched by a pattern is written to the output directory under its own name
+    matching_inputs = list()
+    for pattern in inputs:
+        pattern_inputs = sorted(glob.glob(pattern))
+        if len(pattern_inputs) == 0:
+            logging.warning(f"no inputs found for {pattern}")
+
+        matching_inputs.extend(pattern_inputs)
+
+    jobs = [(input, os.path.join(output_directory, output_name)) for input, output_name in zip(matching_inputs, _output_names(matching_inputs))]
+
+    # a jobs file contains one dataset per line, with the input and the output separated by whitespace
+    if jobs_filename is not None:
+        with open(jobs_filename, 'r') as jobs_file:
+            for line in jobs_file:
+                line = line.strip()
+                if line == '' or line.startswith('#'):
+                    continue
+
+                job = line.split()
+                if len(job) != 2:
+                    raise ValueError(f"invalid line in jobs file {jobs_filename}: {line}")
+
+                jobs.append((job[0], job[1]))
+
+    # datasets written to the same output would overwrite each other
+    outputs = dict()
+    for input, output in jobs:
+        output_key = os.path.normcase(os.path.abspath(output))
+        if output_key in outputs:
+            raise ValueError(f"{outputs[output_key]} and {input} are both converted to {output}")
+
+        outputs[output_key] = input
+
+    return jobs
+
+def _output_names(inputs):
+    # inputs are named after their file or directory, inputs of the same name after their path below the common parent, e.g. op1/export.zip and op2/export.zip
+    names = [os.path.basename(os.path.normpath(input)) for input in inputs]
+
+    inputs_by_name = dict()
+    for input, name in zip(inputs, names):
+        inputs_by_name.setdefault(name, set()).add(os.path.abspath(input))
+
+    for i, (input, name) in enumerate(zip(inputs, names)):
+        if len(inputs_by_name[name]) > 1:
+            common_path = os.path.commonpath(list(inputs_by_name[name]))
+            names[i] = os.path.relpath(os.path.abspath(input), common_path).replace(os.sep, '-')
+
+    return names
+
+def run_batch(converter, jobs, workers=1, line_filter=None):
+    global _batch_converter
+
+    if line_filter is None:
+        line_filter = list()
+
+    run_parallel = workers > 1 and len(jobs) > 1
+    if run_parallel and not 'fork' in multiprocessing.get_all_start_methods():
+        logging.warning('parallel batch conversion requires the fork start method, converting datasets serially')
+        run_parallel = False
+
+    logging.info(f"converting {len(jobs)} datasets ...")
+
+    # workers are forked once for the whole batch and reuse the converter with its parsed config for every dataset
+    _batch_converter = converter
+    try:
+        tasks = [(input, output, line_filter) for input, output in jobs]
+        if run_parallel:
+            # datasets with the same content are converted one after another by the same worker, so that all but the first one are read from the cache
+            task_groups = dict()
+            for i, (input, output) in enumerate(jobs):
+                task_groups.setdefault(_input_content_key(input), list()).append(i)
+
+            results = [None] * len(tasks)
+            with multiprocessing.get_context('fork').Pool(min(workers, len(task_groups))) as pool:
+                for task_indices, group_results in zip(task_groups.values(), pool.imap(_convert_datasets, [[tasks[i] for i in g] for g in task_groups.values()])):
+                    for i, result in zip(task_indices, group_results):
+                        results[i] = result
+        else:
+            results = [_convert_dataset(t) for t in tasks]
+    finally:
+        _batch_converter = None
+
+    return results
+
+def format_batch_results(results, wall_seconds):
+    lines = [f"{'dataset':<40} {'status':<8} {'seconds':>9} {'routes':>8} {'routes/s':>10} {'rows/s':>10} {'MB/s':>8}"]
+    for result in results + [_total_result(results, wall_seconds)]:
+        lines.append(
+            f"{os.path.basename(os.path.normpath(result['input'])):<40} {result['status']:<8} {result['seconds']:>9.2f} {result['routes']:>8} "
+            f"{_rate(result['routes'], result['seconds']):>10.1f} {_rate(result['rows_parsed'], result['seconds']):>10.0f} "
+            f"{_rate(result['input_bytes'] / (1024.0 * 1024.0), result['seconds']):>8.2f}"
+        )
+
+    return lines
+
+def _convert_datasets(tasks):
+    return [_convert_dataset(t) for t in tasks]
+
+def _convert_dataset(task):
+    input, output, line_filter = task
+
+    logging.info(f"converting {input} to {output} ...")
+
+    start_time = time.perf_counter()
+    error = None
+    try:
+        if not output.lower().endswith('.zip'):
+            os.makedirs(output, exist_ok=True)
+        elif os.path.dirname(output) != '':
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+
+        _batch_converter.convert(input, output, line_filter)
+    except Exception as ex:
+        # a broken dataset does not stop the conversion of the others
+        logging.exception(f"could not convert {input}")
+        error = str(ex)
+
+    stats = _batch_converter._stats.as_dict()
+
+    return {
+        'input': input,
+        'output': output,
+        'status': 'ok' if error is None else 'failed',
+        'error': error,
+        'seconds': time.perf_counter() - start_time,
+        'input_bytes': _input_size(input),
+        'routes': stats['counters'].get('routes', 0),
+        'rows_parsed': sum(v for k, v in stats['counters'].items() if k.startswith('rows_parsed:')),
+        'bytes_written': stats['counters'].get('bytes_written', 0),
+        'stats': stats
+    }
+
+def _total_result(results, wall_seconds):
+    # the total rates refer to the wall time of the whole batch, not to the sum of the dataset times
+    return {
+        'input': 'total',
+        'status': 'ok' if all(r['status'] == 'ok' for r in results) else 'failed',
+        'seconds': wall_seconds,
+        'input_bytes': sum(r['input_bytes'] for r in results),
+        'routes': sum(r['routes'] for r in results),
+        'rows_parsed': sum(r['rows_parsed'] for r in results)
+    }
+
+def _input_content_key(input):
+    # content hashes are computed before forking the workers, which reuse them when looking up the cache
+    try:
+        if os.path.isdir(input):
+            return tuple(sorted((f, file_content_hash(os.path.join(input, f))) for f in os.listdir(input) if f.endswith('.x10')))
+
+        with zipfile.ZipFile(input, 'r') as zip_file:
+            return tuple(sorted((os.path.basename(i.filename), zip_member_content_hash(zip_file, i)) for i in zip_file.infolist() if i.filename.endswith('.x10')))
+    except (OSError, zipfile.BadZipFile):
+        # inputs which cannot be read are not grouped, their conversion reports the error
+        return input
+
+def _input_size(input):
+    if os.path.isfile(input):
+        return os.path.getsize(input)
+    elif os.path.isdir(input):
+        return sum(os.path.getsize(os.path.join(input, f)) for f in os.listdir(input) if f.endswith('.x10'))
+    else:
+        return 0
+
+def _rate(value, seconds):
+    return value / seconds if seconds > 0 else 0.0
@@ -0,0 +1,221 @@
+import click
+import io
+import json
+import logging
+import numpy
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from vdv2geojson.converter import VdvGeoJsonConverter
+from vdv2geojson.dialect.vdvstandard import _convert_coordinate_vdv
+from vdv2geojson.dialect.vdvstandard import _convert_coordinates_vdv
+from vdv2geojson.geojson import GeoJsonFeatureCollectionWriter
+from vdv2geojson.simplify import simplify_linestring
+from vdv2geojson.synthetic import generate_dataset
+from vdv2geojson.x10 import read_x10_file
+
+########################################################################################################################
+# Benchmark harness timing and memory-profiling each pipeline stage on synthetic datasets of several scales.
+########################################################################################################################
+
+SCALES = {
+    'small': dict(num_stops=500, num_sections=1500, num_lines=20, num_route_variants=4),
+    'medium': dict(num_stops=5000, num_sections=15000, num_lines=100, num_route_variants=4),
+    'large': dict(num_stops=20000, num_sections=60000, num_lines=400, num_route_variants=6)
+}
+
+TABLES = ['REC_ORT', 'REC_SEL', 'REC_SEL_ZP', 'REC_LID', 'LID_VERLAUF']
+
+def run_benchmarks(scales, repeat=3, profile_memory=True):
+    results = list()
+    for scale in scales:
+        working_directory = tempfile.mkdtemp(prefix=f"vdv2geojson-benchmark-{scale}-")
+        try:
+            input_directory = os.path.join(working_directory, 'input')
+            output_directory = os.path.join(working_directory, 'output')
+
+            context = dict()
+            for stage_name, stage, setup in _create_stages(input_directory, output_directory, SCALES[scale], context):
+                if setup is not None:
+                    setup()
+
+                result = _run_stage(stage, repeat, profile_memory)
+                result['scale'] = scale
+                result['stage'] = stage_name
+
+                results.append(result)
+        finally:
+            shutil.rmtree(working_directory, ignore_errors=True)
+
+    return results
+
+def _create_stages(input_directory, output_directory, scale_parameters, context):
+    # stages run in this order, later stages use the tables loaded by earlier ones
+    def generate():
+        generate_dataset(input_directory, **scale_parameters)
+
+    def read_rows():
+        context['tables'] = {t: read_x10_file(os.path.join(input_directory, f"{t}.x10"), 'NULL', 'iso-8859-1') for t in TABLES}
+
+    def read_columns():
+        for t in TABLES:
+            read_x10_file(os.path.join(input_directory, f"{t}.x10"), 'NULL', 'iso-8859-1', storage='columns')
+
+    def find_records():
+        x10_LID_VERLAUF = context['tables']['LID_VERLAUF']
+        x10_LID_VERLAUF.create_index(['LI_NR', 'STR_LI_VAR'])
+
+        for rec_lid_record in context['tables']['REC_LID'].records:
+            x10_LID_VERLAUF.find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
+
+    def convert_coordinates():
+        for record in context['tables']['REC_ORT'].records:
+            _convert_coordinate_vdv(record['ORT_POS_LAENGE'])
+            _convert_coordinate_vdv(record['ORT_POS_BREITE'])
+
+    def convert_coordinates_batch():
+        rec_ort_records = context['tables']['REC_ORT'].records
+        _convert_coordinates_vdv([r['ORT_POS_LAENGE'] for r in rec_ort_records])
+        _convert_coordinates_vdv([r['ORT_POS_BREITE'] for r in rec_ort_records])
+
+    def simplify():
+        for route_coordinates in _route_coordinates(context):
+            simplify_linestring(route_coordinates, 0.000005)
+
+    def write_geojson():
+        geojson_writer = GeoJsonFeatureCollectionWriter(io.StringIO())
+        for route_coordinates in _route_coordinates(context):
+            geojson_writer.write_feature({
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'LineString',
+                    'coordinates': route_coordinates.tolist()
+                },
+                'properties': dict()
+            })
+
+        geojson_writer.close()
+
+    def convert():
+        shutil.rmtree(output_directory, ignore_errors=True)
+        os.makedirs(output_directory)
+
+        VdvGeoJsonConverter().convert(input_directory, output_directory, [])
+
+    def prepare_route_coordinates():
+        _route_coordinates(context)
+
+    return [
+        ('generate', generate, None),
+        ('read_x10_rows', read_rows, None),
+        ('read_x10_columns', read_columns, None),
+        ('find_records', find_records, None),
+        ('convert_coordinates', convert_coordinates, None),
+        ('convert_coordinates_batch', convert_coordinates_batch, None),
+        ('simplify', simplify, prepare_route_coordinates),
+        ('write_geojson', write_geojson, prepare_route_coordinates),
+        ('convert', convert, None)
+    ]
+
+def _route_coordinates(context):
+    # route geometries are assembled once from the loaded tables before the stages working on shapes are timed
+    if 'route_coordinates' not in context:
+        tables = context['tables']
+
+        point_coordinates = dict()
+        for record in tables['REC_ORT'].records:
+            point_coordinates[(record['ONR_TYP_NR'], record['ORT_NR'])] = (
+                _convert_coordinate_vdv(record['ORT_POS_LAENGE']),
+                _convert_coordinate_vdv(record['ORT_POS_BREITE'])
+            )
+
+        section_points = dict()
+        for record in tables['REC_SEL_ZP'].records:
+            section_identifier = (record['ONR_TYP_NR'], record['ORT_NR'], record['SEL_ZIEL_TYP'], record['SEL_ZIEL'])
+            section_points.setdefault(section_identifier, list()).append((record['ZP_TYP'], record['ZP_ONR']))
+
+        context['route_coordinates'] = list()
+        for rec_lid_record in tables['REC_LID'].records:
+            lid_verlauf_items = tables['LID_VERLAUF'].find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
+
+            route_points = [(lid_verlauf_items[0]['ONR_TYP_NR'], lid_verlauf_items[0]['ORT_NR'])]
+            for last_lid_verlauf_item, lid_verlauf_item in zip(lid_verlauf_items, lid_verlauf_items[1:]):
+                section_identifier = (last_lid_verlauf_item['ONR_TYP_NR'], last_lid_verlauf_item['ORT_NR'], lid_verlauf_item['ONR_TYP_NR'], lid_verlauf_item['ORT_NR'])
+                route_points.extend(section_points.get(section_identifier, [section_identifier[2:]]))
+
+            context['route_coordinates'].append(numpy.array([point_coordinates[p] for p in route_points]))
+
+    return context['route_coordinates']
+
+def _run_stage(stage, repeat, profile_memory):
+    # the fastest of all runs is reported
+    durations = list()
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        stage()
+        durations.append(time.perf_counter() - start_time)
+
+    result = {
+        'seconds': min(durations),
+        'peak_memory_mb': None
+    }
+
+    # tracing allocations slows down execution, so memory is measured in a separate run
+    if profile_memory:
+        tracemalloc.start()
+        try:
+            stage()
+            result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / (1024.0 * 1024.0)
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+def _format_result(result, baseline_result=None):
+    peak_memory = f"{result['peak_memory_mb']:.1f}" if result['peak_memory_mb'] is not None else '-'
+    line = f"{result['scale']:<8} {result['stage']:<28} {result['seconds']:>10.4f} {peak_memory:>12}"
+
+    if baseline_result is not None:
+        line = f"{line} {result['seconds'] / baseline_result['seconds']:>10.2f}x"
+
+    return line
+
+@click.command
+@click.option('--scales', default='small,medium', help=f"comma-separated scales to run, available are {', '.join(SCALES.keys())}")
+@click.option('--repeat', default=3, type=int, help='number of timed runs per stage, the fastest one is reported')
+@click.option('--memory/--no-memory', default=True, help='measure the peak memory of each stage in an additional run')
+@click.option('--output', default=None, help='JSON file for storing the results')
+@click.option('--baseline', default=None, help='JSON file of a previous run to compare the results with')
+def main(scales, repeat, memory, output, baseline):
+    scales = [s.strip() for s in scales.split(',')]
+    for scale in scales:
+        if scale not in SCALES:
+            raise click.BadParameter(f"unknown scale {scale}", param_hint='--scales')
+
+    baseline_results = dict()
+    if baseline is not None:
+        with open(baseline, 'r') as baseline_file:
+            baseline_results = {(r['scale'], r['stage']): r for r in json.load(baseline_file)}
+
+    results = run_benchmarks(scales, repeat, memory)
+
+    header = f"{'scale':<8} {'stage':<28} {'seconds':>10} {'peak MiB':>12}"
+    if baseline is not None:
+        header = f"{header} {'baseline':>11}"
+
+    click.echo(header)
+    for result in results:
+        click.echo(_format_result(result, baseline_results.get((result['scale'], result['stage']))))
+
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+if __name__ == '__main__':
+    # progress messages of the converter would distort the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    main()
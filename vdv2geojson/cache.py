@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import os
+import pickle
+
+########################################################################################################################
+# Persistent cache for parsed tables and derived indexes.
+########################################################################################################################
+
+# increase whenever the layout of cached objects changes, so that old entries are not used anymore
+CACHE_VERSION = 3
+
+class ParsedTableCache:
+
+    def __init__(self, cache_directory):
+        self.cache_directory = cache_directory
+
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+    def load(self, name, sources, settings, loader):
+        cache_filename = self._cache_filename(name, sources, settings)
+
+        # entries stored for another location with the same content are used as well, e.g. the same table in another dataset
+        existing_filename = cache_filename if os.path.isfile(cache_filename) else self._find_same_content(cache_filename)
+
+        if existing_filename is not None:
+            try:
+                with open(existing_filename, 'rb') as cache_file:
+                    obj = pickle.load(cache_file)
+
+                logging.info(f"loaded {name} from cache")
+                return obj
+            except Exception as ex:
+                logging.warning(f"could not load {name} from cache: {ex}")
+
+        obj = loader()
+        self._store(cache_filename, obj)
+
+        return obj
+
+    def clear(self):
+        for cache_filename in os.listdir(self.cache_directory):
+            if cache_filename.endswith('.pickle'):
+                os.remove(os.path.join(self.cache_directory, cache_filename))
+
+    def _store(self, cache_filename, obj):
+        # remove outdated entries of the same name, their source files have changed
+        name_prefix = os.path.basename(cache_filename).rsplit('-', 1)[0] + '-'
+        for existing_filename in os.listdir(self.cache_directory):
+            if existing_filename.startswith(name_prefix) and existing_filename.endswith('.pickle'):
+                os.remove(os.path.join(self.cache_directory, existing_filename))
+
+        # write to a temporary file first, so that concurrent runs never see a partial entry
+        temp_filename = f"{cache_filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'wb') as cache_file:
+            pickle.dump(obj, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_filename, cache_filename)
+
+    def _find_same_content(self, cache_filename):
+        name_prefix, content_suffix = os.path.basename(cache_filename).rsplit('_', 1)[0] + '_', '-' + cache_filename.rsplit('-', 1)[1]
+        for existing_filename in os.listdir(self.cache_directory):
+            if existing_filename.startswith(name_prefix) and existing_filename.endswith(content_suffix):
+                return os.path.join(self.cache_directory, existing_filename)
+
+        return None
+
+    def _cache_filename(self, name, sources, settings):
+        key = hashlib.sha1()
+        key.update(repr((CACHE_VERSION, sorted(settings.items()))).encode('utf-8'))
+
+        # sources are pairs of location and content identifier, entries are replaced when the content of a location changes
+        location = hashlib.sha1()
+        for source_location, source_content_id in sources:
+            location.update(source_location.encode('utf-8'))
+            key.update(source_content_id.encode('utf-8'))
+
+        return os.path.join(self.cache_directory, f"{name}_{location.hexdigest()[:12]}-{key.hexdigest()}.pickle")
@@ -0,0 +1,130 @@
+import collections
+import concurrent.futures
+import gzip
+import sys
+import time
+import zipfile
+import zlib
+
+########################################################################################################################
+# Helper classes for compressing output files in parallel threads and storing them in order.
+########################################################################################################################
+
+COMPRESSION_METHODS = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA
+}
+
+# members compressed elsewhere are stored with private ZipFile internals, which are only relied on in the versions they are known to work with
+_RAW_ZIP_MEMBERS = (
+    (3, 7) <= sys.version_info[:2] < (3, 14)
+    and hasattr(zipfile, '_get_compressor')
+    and hasattr(zipfile.ZipFile, '_writecheck')
+    and hasattr(zipfile.ZipInfo, 'FileHeader')
+)
+
+def supports_parallel_zip_compression():
+    return _RAW_ZIP_MEMBERS
+
+class ParallelCompressor:
+
+    def __init__(self, num_threads=1, max_pending=None):
+        self.num_threads = num_threads
+        self.max_pending = max_pending if max_pending is not None else 4 * num_threads
+
+        self._executor = None
+        self._pending = collections.deque()
+
+    def submit(self, compress, data, store):
+        # zlib, bz2 and lzma release the GIL while compressing, so threads compress in parallel
+        if self.num_threads <= 1:
+            store(compress(data))
+            return
+
+        # threads are started on first use, so that processes forked before do not inherit them
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.num_threads, thread_name_prefix='compression')
+
+        self._pending.append((store, self._executor.submit(compress, data)))
+
+        # results are stored in the order they were submitted, only a limited number of them is kept in memory
+        while len(self._pending) > 0 and (self._pending[0][1].done() or len(self._pending) > self.max_pending):
+            store, future = self._pending.popleft()
+            store(future.result())
+
+    def close(self):
+        while len(self._pending) > 0:
+            store, future = self._pending.popleft()
+            store(future.result())
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+def create_zip_member(zip_file, filename):
+    zip_info = zipfile.ZipInfo(filename, date_time=time.localtime(time.time())[:6])
+    zip_info.compress_type = zip_file.compression
+    zip_info.external_attr = 0o600 << 16
+
+    # compressed LZMA data includes an end-of-stream marker
+    if zip_info.compress_type == zipfile.ZIP_LZMA:
+        zip_info.flag_bits |= 0x02
+
+    return zip_info
+
+def compress_zip_member(zip_info, data, compression_level=None):
+    # without the ZipFile internals the data is compressed by ZipFile itself when the member is written
+    if not _RAW_ZIP_MEMBERS:
+        return data
+
+    # the same compressor as ZipFile uses itself, so that the member can be stored as it is
+    compressor = zipfile._get_compressor(zip_info.compress_type, compression_level)
+
+    zip_info.file_size = len(data)
+    zip_info.CRC = zlib.crc32(data)
+
+    if compressor is None:
+        return data
+
+    return compressor.compress(data) + compressor.flush()
+
+def write_zip_member(zip_file, zip_info, compressed_data):
+    if not _RAW_ZIP_MEMBERS:
+        zip_file.writestr(zip_info, compressed_data, compresslevel=zip_file.compresslevel)
+        return
+
+    # ZipFile cannot store data compressed elsewhere, so the member is written the same way ZipFile.open(..., 'w') does
+    zip_info.compress_size = len(compressed_data)
+
+    zip64 = zip_info.file_size * 1.05 > zipfile.ZIP64_LIMIT or zip_info.compress_size > zipfile.ZIP64_LIMIT
+    if zip64 and not zip_file._allowZip64:
+        raise zipfile.LargeZipFile('Filesize would require ZIP64 extensions')
+
+    with zip_file._lock:
+        # the member would be written into the middle of a member streamed by ZipFile.open(..., 'w')
+        if zip_file._writing:
+            raise ValueError("Can't write to ZIP archive while an open writing handle exists")
+
+        if zip_file._seekable:
+            zip_file.fp.seek(zip_file.start_dir)
+
+        zip_info.header_offset = zip_file.fp.tell()
+
+        zip_file._writecheck(zip_info)
+        zip_file._didModify = True
+
+        zip_file.fp.write(zip_info.FileHeader(zip64))
+        zip_file.fp.write(compressed_data)
+
+        zip_file.start_dir = zip_file.fp.tell()
+        zip_file.filelist.append(zip_info)
+        zip_file.NameToInfo[zip_info.filename] = zip_info
+
+def compress_gzip(data, compression_level=None):
+    # without a modification time identical content results in identical files
+    if compression_level is None:
+        return gzip.compress(data, mtime=0)
+
+    return gzip.compress(data, compression_level, mtime=0)
@@ -1,14 +1,44 @@
+import contextlib
+import gzip
+import hashlib
+import io
 import json
 import logging
+import numpy
 import os
-import rdp
+import sys
 import yaml
 import zipfile
 
+from vdv2geojson.cache import ParsedTableCache
+from vdv2geojson.compression import COMPRESSION_METHODS
+from vdv2geojson.compression import ParallelCompressor
+from vdv2geojson.compression import compress_gzip
+from vdv2geojson.compression import compress_zip_member
+from vdv2geojson.compression import create_zip_member
+from vdv2geojson.compression import supports_parallel_zip_compression
+from vdv2geojson.compression import write_zip_member
+from vdv2geojson.geojson import GeoJsonFeatureCollectionWriter
+from vdv2geojson.geojson import GeoJsonSequenceWriter
+from vdv2geojson.manifest import RouteManifest
+from vdv2geojson.simplify import simplify_linestring
+from vdv2geojson.source import open_input_source
+from vdv2geojson.stats import ConversionStats
+from vdv2geojson.tiles import TilePyramidWriter
+from vdv2geojson.topojson import TopologyWriter
+
+OUTPUT_FILE_EXTENSIONS = {
+    'collection': '.geojson',
+    'ndjson': '.ndjson',
+    'geojsonseq': '.geojsons',
+    'topojson': '.topojson'
+}
+
 class VdvGeoJsonConverter:
 
-    def __init__(self, config_filename=None, dialect='vdvstandard'):
+    def __init__(self, config_filename=None, dialect='vdvstandard', cache_directory=None, workers=1, output_mode=None, incremental=None, stats_filename=None, log_routes=None, low_memory=None, compression=None, compression_level=None, compression_threads=None, gzip_output=None):
         self._dialect = dialect
+        self._workers = workers
 
         if config_filename is not None:
             with open(config_filename, 'r') as config_file:
@@ -20,87 +50,401 @@ class VdvGeoJsonConverter:
             self._config['config']['prefer_international_ids'] = True
             self._config['config']['flatten_shapes'] = True
             self._config['config']['flatten_shapes_epsilon'] = 0.000005
+            self._config['config']['flatten_shapes_epsilon_unit'] = 'degrees'
+            self._config['config']['flatten_shapes_algorithm'] = 'douglas-peucker'
+            self._config['config']['flatten_shapes_per_section'] = False
+
+            self._config['config']['geojson'] = dict()
+            self._config['config']['geojson']['compact'] = False
+            self._config['config']['geojson']['coordinate_precision'] = None
+            self._config['config']['geojson']['output_mode'] = 'files'
+            self._config['config']['geojson']['output_filename'] = 'routes'
+            self._config['config']['geojson']['tiles'] = dict()
+            self._config['config']['geojson']['tiles']['min_zoom'] = 8
+            self._config['config']['geojson']['tiles']['max_zoom'] = 14
+            self._config['config']['geojson']['tiles']['tolerance_pixels'] = 1.0
+            self._config['config']['geojson']['tiles']['buffer_pixels'] = 4
+            self._config['config']['geojson']['tiles']['directory'] = 'tiles'
+            self._config['config']['geojson']['topojson'] = dict()
+            self._config['config']['geojson']['topojson']['quantization'] = 1000000
+            self._config['config']['geojson']['compression'] = 'deflated'
+            self._config['config']['geojson']['compression_level'] = None
+            self._config['config']['geojson']['compression_threads'] = None
+            self._config['config']['geojson']['gzip'] = False
 
             self._config['config']['x10'] = dict()
             self._config['config']['x10']['null_value'] = 'NULL'
             self._config['config']['x10']['encoding'] = 'utf-8'
+            self._config['config']['x10']['storage'] = 'rows'
+            self._config['config']['cache_directory'] = None
+            self._config['config']['incremental'] = False
+            self._config['config']['log_routes'] = True
+
+            self._config['config']['low_memory'] = dict()
+            self._config['config']['low_memory']['enabled'] = False
+            self._config['config']['low_memory']['chunk_size'] = 100000
+            self._config['config']['low_memory']['cache_size'] = 10000
+            self._config['config']['low_memory']['temp_directory'] = None
 
             self._config['data'] = dict()
             self._config['data']['extract_shapes'] = True
             self._config['data']['extract_shapes_intermediate_stops'] = True
 
+        if cache_directory is None:
+            cache_directory = self._config['config'].get('cache_directory', None)
+
+        if cache_directory is not None:
+            self._cache = ParsedTableCache(cache_directory)
+        else:
+            self._cache = None
+
+        if output_mode is None:
+            output_mode = self._config['config'].get('geojson', dict()).get('output_mode', 'files')
+
+        if output_mode not in ('files', 'tiles') and output_mode not in OUTPUT_FILE_EXTENSIONS:
+            raise ValueError(f"unknown output mode {output_mode}")
+
+        self._output_mode = output_mode
+
+        if incremental is None:
+            incremental = self._config['config'].get('incremental', False)
+
+        self._incremental = incremental
+        self._manifest = None
+
+        if log_routes is None:
+            log_routes = self._config['config'].get('log_routes', True)
+
+        self._log_routes = log_routes
+
+        if low_memory is None:
+            low_memory = self._config['config'].get('low_memory', dict()).get('enabled', False)
+
+        self._low_memory = low_memory
+
+        geojson_config = self._config['config'].get('geojson', dict())
+
+        if compression is None:
+            compression = geojson_config.get('compression', 'deflated')
+
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError(f"unknown compression method {compression}")
+
+        self._compression = compression
+
+        if compression_level is None:
+            compression_level = geojson_config.get('compression_level', None)
+
+        self._compression_level = compression_level
+
+        if compression_threads is None:
+            compression_threads = geojson_config.get('compression_threads', None)
+
+        if compression_threads is None:
+            compression_threads = os.cpu_count() or 1
+
+        self._compression_threads = compression_threads
+
+        if gzip_output is None:
+            gzip_output = geojson_config.get('gzip', False)
+
+        self._gzip_output = gzip_output
+        self._output_compressor = None
+
+        self._stats_filename = stats_filename
+        self._stats = ConversionStats()
+
         self._geojson_linestring_features = list()
         self._geojson_files = list()
 
+        self._output_directory = None
+        self._output_zip = None
+        self._output_buffers = None
+        self._output_writer = None
+        self._output_stack = None
+
     def convert(self, input, output, line_filter):
-        
-        if input.endswith('.zip'):
-            input_directory = os.path.dirname(input)
-        else:
-            input_directory = input
+        # a converter may convert several datasets one after another, e.g. in batch mode
+        self._stats = ConversionStats()
+        self._geojson_linestring_features = list()
+        self._geojson_files = list()
+        self._output_directory = None
 
-        if output.endswith('.zip'):
-            output_directory = os.path.dirname(output)
-        else:
-            output_directory = output
-        
-        if input.endswith('.zip'):
-            logging.info(f"unpacking ZIP archive {input} ...")
+        with self._stats.stage('total'):
+            self._convert(input, output, line_filter)
 
-            with zipfile.ZipFile(input, 'r') as zip_file:
-                zip_file.extractall(input_directory)
+        if self._stats_filename is not None:
+            logging.info(f"writing statistics to {self._stats_filename} ...")
+            self._stats.write(self._stats_filename)
 
-        if self._dialect == 'vdvstandard':
-            from vdv2geojson.dialect import vdvstandard
-            vdvstandard.convert(self, input_directory, output_directory, line_filter)
-        else:
-            logging.error(f"unknown dialect {self._dialect}")
+    def _convert(self, input, output, line_filter):
+        # input archives are read in place and output archives are written member by member without temporary files
+        input_source = open_input_source(input)
 
-        if output.endswith('.zip'):
+        if output.lower().endswith('.zip'):
             logging.info(f"creating ZIP archive {output} ...")
+            self._output_zip = zipfile.ZipFile(output, 'w', compression=COMPRESSION_METHODS[self._compression], compresslevel=self._compression_level)
+
+            if self._gzip_output:
+                logging.warning('GZIP files are only written to output directories, the members of the ZIP archive are compressed instead')
+
+            if self._compression_threads > 1 and not supports_parallel_zip_compression():
+                logging.warning(f"ZIP members cannot be compressed in parallel with Python {sys.version_info[0]}.{sys.version_info[1]}, compressing them while writing the archive")
+        else:
+            self._output_directory = output
+
+        # files are compressed in parallel threads while the conversion goes on
+        self._output_compressor = ParallelCompressor(self._compression_threads)
+
+        if self._incremental:
+            if self._low_memory:
+                logging.warning('incremental conversion is not supported in low memory mode, converting all routes')
+            elif self._output_zip is None and self._output_mode == 'files':
+                self._manifest = RouteManifest(os.path.join(output, 'manifest.json'), self._config_hash())
+            else:
+                logging.warning('incremental conversion requires one GeoJSON file per route in an output directory, converting all routes')
+
+        try:
+            if self._output_mode != 'files':
+                self._open_output_writer()
+
+            if self._dialect == 'vdvstandard':
+                from vdv2geojson.dialect import vdvstandard
+                vdvstandard.convert(self, input_source, line_filter)
+            else:
+                logging.error(f"unknown dialect {self._dialect}")
+
+            if self._manifest is not None:
+                self._manifest.save()
+        finally:
+            input_source.close()
+
+            self._manifest = None
 
-            with zipfile.ZipFile(output, 'w') as zip_file:
-                for json_file in self._geojson_files:
-                    zip_file.write(
-                        json_file,
-                        os.path.basename(json_file),
-                        compress_type=zipfile.ZIP_DEFLATED
-                    )
+            if self._output_writer is not None:
+                self._close_output_writer()
 
-                    os.remove(json_file)
+            with self._stats.stage('compression'):
+                self._output_compressor.close()
+                self._output_compressor = None
 
-        if input.lower().endswith('.zip'):
-            for file in os.listdir(input_directory):
-                if file.lower().endswith('.x10') or file.lower().endswith('.geojson'):
-                    os.remove(os.path.join(input_directory, file))
+            if self._output_zip is not None:
+                with self._stats.stage('zipping'):
+                    self._output_zip.close()
+                    self._output_zip = None
 
-    def _add_linestring_feature(self, coordinates, properties):
-        if self._config['config']['flatten_shapes']:
+                self._stats.count('zip_bytes', os.path.getsize(output))
+
+    def _add_linestring_feature(self, coordinates, properties, flatten=True):
+        self._geojson_linestring_features.append(self._create_linestring_feature(coordinates, properties, flatten))
+
+    def _create_linestring_feature(self, coordinates, properties, flatten=True):
+        if flatten and self._config['config']['flatten_shapes']:
             num_coordinates = len(coordinates)
-            logging.info(f"compressing shape of {num_coordinates} points ...")
-            coordinates = rdp.rdp(coordinates, self._config['config']['flatten_shapes_epsilon'])
-            logging.info(f"compressed shape from {num_coordinates} to {len(coordinates)} points")
+            if self._log_routes:
+                logging.info(f"compressing shape of {num_coordinates} points ...")
+
+            coordinates = self._simplify_linestring(coordinates)
+
+            if self._log_routes:
+                logging.info(f"compressed shape from {num_coordinates} to {len(coordinates)} points")
+        elif isinstance(coordinates, numpy.ndarray):
+            coordinates = coordinates.tolist()
         
-        self._geojson_linestring_features.append({
+        return {
             'type': 'Feature',
             'geometry': {
                 'type': 'LineString',
                 'coordinates': coordinates
             },
             'properties': properties
-        })
+        }
+
+    def _simplify_linestring(self, coordinates):
+        with self._stats.stage('simplification'):
+            simplified_coordinates = simplify_linestring(
+                coordinates, 
+                self._config['config']['flatten_shapes_epsilon'],
+                self._config['config'].get('flatten_shapes_algorithm', 'douglas-peucker'),
+                self._config['config'].get('flatten_shapes_epsilon_unit', 'degrees')
+            )
+
+        self._stats.count('simplification_points_in', len(coordinates))
+        self._stats.count('simplification_points_out', len(simplified_coordinates))
+
+        return simplified_coordinates
 
     def _write_linestring_geojson_file(self, geojson_filename):
-        self._write_geojson_file(geojson_filename, {
-            'type': 'FeatureCollection',
-            'features': self._geojson_linestring_features
-        })
+        with self._stats.stage('serialization'):
+            if self._output_writer is not None:
+                # all routes are streamed into one combined output file instead
+                for geojson_feature in self._geojson_linestring_features:
+                    if self._output_buffers is not None:
+                        self._output_buffers.append(self._output_writer.encode_feature(geojson_feature))
+                    else:
+                        self._output_writer.write_feature(geojson_feature)
+            else:
+                self._write_geojson_file(geojson_filename, self._geojson_linestring_features)
+
+        self._stats.count('features_written', len(self._geojson_linestring_features))
 
         self._geojson_linestring_features = list()
+
+    def _open_output_writer(self):
+        if self._output_mode == 'tiles':
+            self._output_writer = self._create_tile_writer()
+            return
+
+        output_filename = self._config['config'].get('geojson', dict()).get('output_filename', 'routes')
+        output_filename = f"{output_filename}{OUTPUT_FILE_EXTENSIONS[self._output_mode]}"
+
+        logging.info(f"writing all routes to {output_filename} ...")
+
+        self._geojson_files.append(output_filename)
+
+        self._output_stack = contextlib.ExitStack()
+        self._output_writer = self._create_geojson_writer(self._output_stack.enter_context(self._open_output_file(output_filename, True)))
+
+    def _close_output_writer(self):
+        if self._output_mode == 'tiles':
+            logging.info('clipping routes into tiles ...')
+            with self._stats.stage('tiling'):
+                self._output_writer.close()
+
+            self._geojson_files.extend(self._output_writer.filenames)
+            self._stats.count('tiles_written', len(self._output_writer.filenames))
+        else:
+            self._output_writer.close()
+            self._output_stack.close()
+
+        self._stats.count('bytes_written', self._output_writer.num_bytes)
+
+        self._output_writer = None
+        self._output_stack = None
     
-    def _write_geojson_file(self, geojson_filename, geojson_data):
+    def _write_geojson_file(self, geojson_filename, geojson_features):
         self._geojson_files.append(geojson_filename)
         
-        with open(geojson_filename, 'w', encoding='utf-8') as geojson_file:
-            json.dump(geojson_data, geojson_file, indent=4)
-            
\ No newline at end of file
+        with self._open_output_file(geojson_filename) as geojson_file:
+            geojson_writer = self._create_geojson_writer(geojson_file)
+            for geojson_feature in geojson_features:
+                geojson_writer.write_feature(geojson_feature)
+
+            geojson_writer.close()
+
+        self._stats.count('bytes_written', geojson_writer.num_bytes)
+
+    @contextlib.contextmanager
+    def _open_output_file(self, filename, streamed=False):
+        if self._output_buffers is not None:
+            # worker processes must not write into the shared output archive, they hand their files to the parent instead
+            output_buffer = io.StringIO()
+            yield output_buffer
+            self._output_buffers.append((filename, output_buffer.getvalue().encode('utf-8')))
+        elif (self._output_zip is not None or self._gzip_output) and not streamed:
+            # single files are compressed as a whole by the compression threads, combined output files are streamed instead
+            output_buffer = io.StringIO()
+            yield output_buffer
+            self._write_compressed_output_file(filename, output_buffer.getvalue().encode('utf-8'))
+        elif self._output_zip is not None:
+            with io.TextIOWrapper(self._output_zip.open(filename, 'w'), encoding='utf-8') as output_file:
+                yield output_file
+        else:
+            if self._gzip_output:
+                with io.TextIOWrapper(gzip.GzipFile(self._create_output_path(filename), 'wb', self._compression_level if self._compression_level is not None else 9, mtime=0), encoding='utf-8') as output_file:
+                    yield output_file
+            else:
+                with open(self._create_output_path(filename), 'w', encoding='utf-8') as output_file:
+                    yield output_file
+
+    def _write_compressed_output_file(self, filename, data):
+        if self._output_zip is not None:
+            zip_info = create_zip_member(self._output_zip, filename)
+            compress = lambda d: compress_zip_member(zip_info, d, self._compression_level)
+            store = lambda c: self._write_output_member(zip_info, c)
+        else:
+            output_path = self._create_output_path(filename)
+            compress = lambda d: compress_gzip(d, self._compression_level)
+            store = lambda c: self._write_output_path(output_path, c)
+
+        self._output_compressor.submit(compress, data, store)
+
+    def _write_output_member(self, zip_info, data):
+        write_zip_member(self._output_zip, zip_info, data)
+
+        self._stats.count('compressed_bytes', zip_info.compress_size)
+
+    def _write_output_path(self, output_path, data):
+        with open(output_path, 'wb') as output_file:
+            output_file.write(data)
+
+        self._stats.count('compressed_bytes', len(data))
+
+    def _output_path(self, filename):
+        # pre-compressed files can be served by web servers as they are, using Content-Encoding: gzip
+        if self._gzip_output:
+            return os.path.join(self._output_directory, f"{filename}.gz")
+
+        return os.path.join(self._output_directory, filename)
+
+    def _create_output_path(self, filename):
+        # tiles are written into sub directories per zoom level and column
+        if os.path.dirname(filename) != '':
+            os.makedirs(os.path.join(self._output_directory, os.path.dirname(filename)), exist_ok=True)
+
+        return self._output_path(filename)
+
+    def _output_file_exists(self, filename):
+        return self._output_directory is not None and os.path.isfile(self._output_path(filename))
+
+    def _remove_output_file(self, filename):
+        if self._output_file_exists(filename):
+            os.remove(self._output_path(filename))
+
+    def _config_hash(self):
+        # settings which do not change the generated GeoJSON are left out
+        config = dict(self._config)
+        config['config'] = {k: v for k, v in self._config['config'].items() if k not in ('cache_directory', 'incremental', 'low_memory')}
+
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _write_output_buffers(self, output_buffers):
+        if self._output_writer is not None:
+            with self._stats.stage('serialization'):
+                for encoded_feature in output_buffers:
+                    self._output_writer.write_encoded_feature(encoded_feature)
+        else:
+            with self._stats.stage('zipping'):
+                for filename, data in output_buffers:
+                    self._write_compressed_output_file(filename, data)
+
+    def _create_tile_writer(self):
+        geojson_config = self._config['config'].get('geojson', dict())
+        tiles_config = geojson_config.get('tiles', dict())
+
+        return TilePyramidWriter(
+            self._open_output_file,
+            tiles_config.get('min_zoom', 8),
+            tiles_config.get('max_zoom', 14),
+            tiles_config.get('tolerance_pixels', 1.0),
+            tiles_config.get('buffer_pixels', 4),
+            tiles_config.get('directory', 'tiles'),
+            geojson_config.get('coordinate_precision', None),
+            self._config['config'].get('flatten_shapes_algorithm', 'douglas-peucker')
+        )
+
+    def _create_geojson_writer(self, geojson_file):
+        geojson_config = self._config['config'].get('geojson', dict())
+
+        if self._output_mode == 'ndjson':
+            return GeoJsonSequenceWriter(geojson_file, '', geojson_config.get('coordinate_precision', None))
+        elif self._output_mode == 'geojsonseq':
+            return GeoJsonSequenceWriter(geojson_file, '\x1e', geojson_config.get('coordinate_precision', None))
+        elif self._output_mode == 'topojson':
+            return TopologyWriter(geojson_file, geojson_config.get('topojson', dict()).get('quantization', 1000000))
+
+        return GeoJsonFeatureCollectionWriter(
+            geojson_file,
+            geojson_config.get('compact', False),
+            geojson_config.get('coordinate_precision', None)
+        )
@@ -1,191 +1,744 @@
+import hashlib
+import itertools
 import logging
+import multiprocessing
+import numpy
 import os
-
+import shutil
+import tempfile
+import time
+
+from vdv2geojson.compression import ParallelCompressor
+from vdv2geojson.external import BoundedCache
+from vdv2geojson.external import DiskIndex
+from vdv2geojson.external import ExternalSorter
+from vdv2geojson.external import open_disk_index_database
+from vdv2geojson.stats import ConversionStats
+from vdv2geojson.x10 import iter_x10_records
 from vdv2geojson.x10 import read_x10_file
 
-def convert(converter_context, input_directory, output_directory, line_filter):
+_worker_args = None
+
+def convert(converter_context, input_source, line_filter):
+    # datasets which do not fit into memory are streamed route by route from disk instead
+    if converter_context._low_memory:
+        _convert_low_memory(converter_context, input_source, line_filter)
+        return
+
+    dataset = load(converter_context, input_source, line_filter)
+    
+    # export shapes if configured
+    if dataset is not None:
+        x10_REC_LID_records, route_args = dataset
+
+        # run over each line ...
+        routes = list()
+        for rec_lid_record in x10_REC_LID_records:
+            # check for active line filter
+            if len(line_filter) > 0 and not rec_lid_record['LI_NR'] in line_filter:
+                continue
+
+            routes.append(rec_lid_record)
+
+        # skip routes whose inputs did not change since the last run
+        if converter_context._manifest is not None:
+            routes = _filter_changed_routes(converter_context, x10_REC_LID_records, routes, route_args, line_filter)
+
+        run_parallel = converter_context._workers > 1
+        if run_parallel and not 'fork' in multiprocessing.get_all_start_methods():
+            logging.warning('parallel conversion requires the fork start method, converting routes serially')
+            run_parallel = False
+
+        with converter_context._stats.stage('convert_routes'):
+            if run_parallel:
+                for geojson_filename in _convert_routes_parallel(converter_context, routes, route_args):
+                    converter_context._geojson_files.append(geojson_filename)
+            else:
+                for rec_lid_record in routes:
+                    _convert_route(converter_context, rec_lid_record, *route_args)
+
+def load(converter_context, input_source, line_filter=None):
+    # with a line filter only the rows referenced by the selected lines are loaded, cached tables always hold all rows
+    if line_filter and converter_context._config['data']['extract_shapes'] and converter_context._cache is None:
+        tables = _load_tables_filtered(converter_context, input_source, set(line_filter))
+        return _create_dataset(tables)
+
     # load general data
-    logging.info('loading REC_ORT.x10 ...')
-    x10_REC_ORT = read_x10_file(
-        os.path.join(input_directory, 'REC_ORT.x10'), 
-        converter_context._config['config']['x10']['null_value'], 
-        converter_context._config['config']['x10']['encoding']
+    table_loaders = [('REC_ORT', _load_point_data)]
+    if converter_context._config['data']['extract_shapes']:
+        table_loaders = table_loaders + [
+            ('REC_SEL_ZP', _load_section_intermediate_data),
+            ('REC_SEL', _load_section_data),
+            ('LID_VERLAUF', _load_line_courses),
+            ('REC_LID', _load_lines)
+        ]
+
+    tables = _load_tables(converter_context, input_source, table_loaders)
+
+    if not converter_context._config['data']['extract_shapes']:
+        return None
+
+    return _create_dataset(tables)
+
+def _create_dataset(tables):
+    # generate network index ...
+    idx_point_data, point_coordinates = tables['REC_ORT']
+    idx_section_intermediate_data = tables['REC_SEL_ZP']
+    idx_section_data = tables['REC_SEL']
+    x10_LID_VERLAUF = tables['LID_VERLAUF']
+    x10_REC_LID_records = tables['REC_LID']
+
+    # coordinates of each section are resolved once they are used first and shared by all routes
+    idx_section_geometry = dict()
+
+    route_args = (idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF)
+
+    return x10_REC_LID_records, route_args
+
+def create_route_feature(converter_context, rec_lid_record, route_args):
+    idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF = route_args
+
+    line_nr = rec_lid_record['LI_NR']
+    line_name = rec_lid_record['LIDNAME']
+    line_direction = rec_lid_record['LI_RI_NR']
+    line_id = rec_lid_record['LinienID'] if 'LinienID' in rec_lid_record else ''
+    route_nr = rec_lid_record['ROUTEN_NR']
+    route_name = rec_lid_record['STR_LI_VAR']
+
+    if converter_context._log_routes:
+        logging.info(f"found (LineNr-LineDirection-LineVariantName) {line_nr}-{line_direction}-{route_name} - converting now ...")
+
+    with converter_context._stats.stage('route_assembly'):
+        route_coordinates, route_intermediate_stops_meta, route_sections = _assemble_route(converter_context, rec_lid_record, idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF)
+
+    converter_context._stats.count('routes')
+    converter_context._stats.count('route_points', len(route_coordinates))
+
+    # add GeoJSON feature
+    meta_data = dict({
+        'line_nr': line_nr,
+        'line_name': line_name,
+        'line_id': line_id,
+        'line_direction': line_direction,
+        'route_nr': route_nr,
+        'route_name': route_name,
+    })
+
+    if converter_context._config['data']['extract_shapes_intermediate_stops']:
+        meta_data['intermediate_stops'] = route_intermediate_stops_meta
+
+    # sections which were simplified already are not simplified again as part of the route
+    feature = converter_context._create_linestring_feature(route_coordinates, meta_data, not _flatten_sections(converter_context))
+
+    # in a topology each section is written once as an arc, which all routes passing the section refer to
+    if converter_context._output_mode == 'topojson':
+        feature['geometry'] = {
+            'type': 'LineString',
+            'arcs': _create_route_arcs(route_coordinates, route_sections, point_coordinates)
+        }
+
+    return feature
+
+def _convert_route(converter_context, rec_lid_record, *route_args):
+    converter_context._geojson_linestring_features.append(create_route_feature(converter_context, rec_lid_record, route_args))
+
+    # write GeoJOSN file finally
+    converter_context._write_linestring_geojson_file(_route_geojson_filename(rec_lid_record))
+
+def _assemble_route(converter_context, rec_lid_record, idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF):
+    route_geometries = list()
+    route_intermediate_stops_meta = list()
+    route_sections = list()
+
+    lid_verlauf_items = x10_LID_VERLAUF.find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
+
+    # initialize 
+    last_stop_point_identifier = (lid_verlauf_items[0]['ONR_TYP_NR'], lid_verlauf_items[0]['ORT_NR'])
+    last_stop_point = idx_point_data[last_stop_point_identifier]
+
+    stop_dist_travelled = 0.0
+
+    # add first stop to all required datasets
+    intermediate_stop_id = lid_verlauf_items[0]['ORT_NR']
+    if converter_context._config['config']['prefer_international_ids'] and not last_stop_point[1] == '':
+        intermediate_stop_id = last_stop_point[1]
+
+    route_geometries.append(point_coordinates[last_stop_point[2]:last_stop_point[2] + 1])
+
+    route_intermediate_stops_meta.append({
+        'stop_id': intermediate_stop_id,
+        'shape_dist_traveled': stop_dist_travelled
+    })
+
+    # run over remaining items
+    for lid_verlauf_item in lid_verlauf_items[1:]:
+        stop_point_identifier = (lid_verlauf_item['ONR_TYP_NR'], lid_verlauf_item['ORT_NR'])
+        stop_point = idx_point_data[stop_point_identifier]
+
+        # select route section point
+        section_identifier = last_stop_point_identifier + stop_point_identifier
+        section = idx_section_data[section_identifier]
+
+        # increase distance
+        stop_dist_travelled = stop_dist_travelled + section[0]
+
+        # select route section geometry, each distinct section is resolved only once
+        if not section_identifier in idx_section_geometry:
+            idx_section_geometry[section_identifier] = _create_section_geometry(converter_context, section_identifier, idx_point_data, point_coordinates, idx_section_intermediate_data)
+
+        route_geometries.append(idx_section_geometry[section_identifier])
+        route_sections.append((section_identifier, last_stop_point[2], stop_point[2], route_geometries[-1]))
+
+        # generate meta data
+        intermediate_stop_id = lid_verlauf_item['ORT_NR']
+        if converter_context._config['config']['prefer_international_ids'] and not stop_point[1] == '':
+            intermediate_stop_id = stop_point[1]
+
+        route_intermediate_stops_meta.append({
+            'stop_id': intermediate_stop_id,
+            'shape_dist_traveled': (stop_dist_travelled / 1000.0)
+        })
+
+        # set last_stop_point in order to process next section
+        last_stop_point_identifier = stop_point_identifier
+        last_stop_point = stop_point
+
+    route_coordinates = numpy.concatenate(route_geometries)
+
+    return route_coordinates, route_intermediate_stops_meta, route_sections
+
+def _create_route_arcs(route_coordinates, route_sections, point_coordinates):
+    # routes of a single stop point get an arc of this point repeated
+    if len(route_sections) == 0:
+        return [(('point',) + tuple(route_coordinates[0].tolist()), route_coordinates.tolist() * 2)]
+
+    # arcs run from the start to the end stop point of their section, so that each arc ends where the next one starts
+    # intermediate points need not end on the end stop point, in this case it is added and decoded routes pass it unlike the GeoJSON geometry
+    route_arcs = list()
+    for section_identifier, start_point_index, end_point_index, section_geometry in route_sections:
+        arc_geometries = [point_coordinates[start_point_index:start_point_index + 1], section_geometry]
+        if len(section_geometry) == 0 or not numpy.array_equal(section_geometry[-1], point_coordinates[end_point_index]):
+            arc_geometries.append(point_coordinates[end_point_index:end_point_index + 1])
+
+        route_arcs.append((section_identifier, numpy.concatenate(arc_geometries).tolist()))
+
+    return route_arcs
+
+def _create_section_geometry(converter_context, section_identifier, idx_point_data, point_coordinates, idx_section_intermediate_data):
+    # if there are no intermediate points for a section, the end stop point is added instead
+    if section_identifier in idx_section_intermediate_data:
+        section_point_indices = [idx_point_data[p][2] for p in idx_section_intermediate_data[section_identifier]]
+    else:
+        section_point_indices = [idx_point_data[section_identifier[2:]][2]]
+
+    section_coordinates = point_coordinates[section_point_indices]
+
+    if _flatten_sections(converter_context):
+        # simplify the section including its start stop point, which is part of the previous section already
+        start_stop_point_index = idx_point_data[section_identifier[:2]][2]
+        section_coordinates = numpy.concatenate((point_coordinates[start_stop_point_index:start_stop_point_index + 1], section_coordinates))
+        section_coordinates = numpy.array(converter_context._simplify_linestring(section_coordinates))[1:]
+
+    return section_coordinates
+
+def _flatten_sections(converter_context):
+    # arcs of a topology are shared by routes, so they are always simplified per section
+    return converter_context._config['config']['flatten_shapes'] and (converter_context._config['config'].get('flatten_shapes_per_section', False) or converter_context._output_mode == 'topojson')
+
+def _route_geojson_filename(rec_lid_record):
+    return f"{rec_lid_record['LI_NR']}-{rec_lid_record['LI_RI_NR']}-{rec_lid_record['STR_LI_VAR']}.geojson"
+
+def _filter_changed_routes(converter_context, all_routes, routes, route_args, line_filter=None):
+    manifest = converter_context._manifest
+
+    # routes which are not part of the dataset anymore are removed from the output, with a line filter only routes of the selected lines are checked
+    for geojson_filename in manifest.retain(set(_route_geojson_filename(r) for r in all_routes), line_filter):
+        logging.info(f"removing {geojson_filename}, route does not exist anymore")
+        converter_context._remove_output_file(geojson_filename)
+
+    # routes writing the same file share one manifest entry
+    file_hashes = dict()
+    for rec_lid_record in routes:
+        route_hash = _route_content_hash(rec_lid_record, *route_args)
+        file_hashes.setdefault(_route_geojson_filename(rec_lid_record), hashlib.sha1()).update(route_hash.encode('utf-8'))
+
+    changed_filenames = set()
+    for rec_lid_record in routes:
+        geojson_filename = _route_geojson_filename(rec_lid_record)
+        content_hash = file_hashes[geojson_filename].hexdigest()
+
+        if manifest.is_unchanged(geojson_filename, content_hash) and converter_context._output_file_exists(geojson_filename):
+            continue
+
+        manifest.update(geojson_filename, (rec_lid_record['LI_NR'], rec_lid_record['LI_RI_NR'], rec_lid_record['STR_LI_VAR']), content_hash)
+        changed_filenames.add(geojson_filename)
+
+    changed_routes = [r for r in routes if _route_geojson_filename(r) in changed_filenames]
+
+    logging.info(f"{len(changed_routes)} of {len(routes)} routes changed since the last run")
+
+    return changed_routes
+
+def _route_content_hash(rec_lid_record, idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF):
+    # covers every input value the GeoJSON feature of the route is generated from
+    route_content = [(
+        rec_lid_record['LIDNAME'],
+        rec_lid_record['LI_RI_NR'],
+        rec_lid_record['LinienID'] if 'LinienID' in rec_lid_record else '',
+        rec_lid_record['ROUTEN_NR']
+    )]
+
+    last_stop_point_identifier = None
+    for lid_verlauf_item in x10_LID_VERLAUF.find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR']):
+        stop_point_identifier = (lid_verlauf_item['ONR_TYP_NR'], lid_verlauf_item['ORT_NR'])
+        route_content.append(_point_content(stop_point_identifier, idx_point_data, point_coordinates))
+
+        if last_stop_point_identifier is not None:
+            section_identifier = last_stop_point_identifier + stop_point_identifier
+            route_content.append(idx_section_data.get(section_identifier))
+
+            for section_point_identifier in idx_section_intermediate_data.get(section_identifier, list()):
+                route_content.append(_point_content(section_point_identifier, idx_point_data, point_coordinates))
+
+        last_stop_point_identifier = stop_point_identifier
+
+    return hashlib.sha1(repr(route_content).encode('utf-8')).hexdigest()
+
+def _point_content(point_identifier, idx_point_data, point_coordinates):
+    if not point_identifier in idx_point_data:
+        return (point_identifier, None)
+
+    point = idx_point_data[point_identifier]
+    return (point_identifier, point[1], point_coordinates[point[2]].tolist())
+
+def _convert_routes_parallel(converter_context, routes, route_args):
+    global _worker_args
+
+    # routes writing the same file are kept in one task, so that they overwrite each other in the same order as serially
+    route_groups = dict()
+    for route_index, rec_lid_record in enumerate(routes):
+        if converter_context._output_writer is not None:
+            route_groups[route_index] = [rec_lid_record]
+        else:
+            route_groups.setdefault(_route_geojson_filename(rec_lid_record), list()).append(rec_lid_record)
+
+    # resolve all section geometries before forking, so that workers share them instead of resolving them again
+    idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, x10_LID_VERLAUF = route_args
+    for rec_lid_record in routes:
+        lid_verlauf_items = x10_LID_VERLAUF.find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
+        for last_lid_verlauf_item, lid_verlauf_item in zip(lid_verlauf_items, lid_verlauf_items[1:]):
+            section_identifier = (last_lid_verlauf_item['ONR_TYP_NR'], last_lid_verlauf_item['ORT_NR'], lid_verlauf_item['ONR_TYP_NR'], lid_verlauf_item['ORT_NR'])
+            if section_identifier in idx_section_data and not section_identifier in idx_section_geometry:
+                try:
+                    idx_section_geometry[section_identifier] = _create_section_geometry(converter_context, section_identifier, idx_point_data, point_coordinates, idx_section_intermediate_data)
+                except KeyError:
+                    # broken references are reported by the route using the section
+                    pass
+
+    num_workers = converter_context._workers
+    chunksize = max(1, len(route_groups) // (num_workers * 8))
+
+    logging.info(f"converting {len(routes)} routes using {num_workers} workers ...")
+
+    # workers are forked after the indexes are built and share them copy-on-write instead of receiving them pickled
+    _worker_args = (converter_context,) + route_args
+    try:
+        with multiprocessing.get_context('fork').Pool(num_workers) as pool:
+            for geojson_filenames, output_buffers, worker_stats in pool.imap(_convert_route_group, route_groups.values(), chunksize):
+                converter_context._stats.merge(worker_stats)
+
+                if output_buffers is not None:
+                    converter_context._write_output_buffers(output_buffers)
+
+                yield from geojson_filenames
+    finally:
+        _worker_args = None
+
+def _convert_route_group(route_group):
+    converter_context = _worker_args[0]
+    route_args = _worker_args[1:]
+
+    # files for an output archive and features for a combined output file are returned to the parent, which writes them in order
+    if converter_context._output_zip is not None or converter_context._output_writer is not None:
+        converter_context._output_buffers = list()
+
+    # workers compress their own files without threads, they run in parallel already
+    converter_context._output_compressor = ParallelCompressor()
+
+    converter_context._geojson_files = list()
+    converter_context._stats = ConversionStats()
+    for rec_lid_record in route_group:
+        _convert_route(converter_context, rec_lid_record, *route_args)
+
+    return converter_context._geojson_files, converter_context._output_buffers, converter_context._stats.as_dict()
+
+def _convert_low_memory(converter_context, input_source, line_filter):
+    if not converter_context._config['data']['extract_shapes']:
+        return
+
+    low_memory_config = converter_context._config['config'].get('low_memory', dict())
+    chunk_size = low_memory_config.get('chunk_size', 100000)
+
+    if converter_context._workers > 1:
+        logging.warning('low memory conversion converts routes serially')
+
+    value_filter = {'LI_NR': set(line_filter)} if len(line_filter) > 0 else None
+
+    temp_directory = tempfile.mkdtemp(prefix='vdv2geojson-', dir=low_memory_config.get('temp_directory', None))
+    connection = open_disk_index_database(temp_directory)
+
+    # line courses and routes are sorted by line and variant, so that both can be joined while streaming through them
+    line_course_sorter = ExternalSorter(temp_directory, lambda r: (r['LI_NR'], r['STR_LI_VAR'], r['LI_LFD_NR']), chunk_size)
+    route_sorter = ExternalSorter(temp_directory, _line_course_key, chunk_size)
+
+    try:
+        idx_point_data, point_coordinates = _load_cached(converter_context, 'REC_ORT', input_source, _index_point_data, connection, os.path.join(temp_directory, 'coordinates.bin'), chunk_size)
+        idx_section_data = _load_cached(converter_context, 'REC_SEL', input_source, _index_section_data, connection)
+        idx_section_intermediate_data = _load_cached(converter_context, 'REC_SEL_ZP', input_source, _index_section_intermediate_data, connection)
+
+        logging.info('sorting LID_VERLAUF.x10 ...')
+        with converter_context._stats.stage('sort:LID_VERLAUF'):
+            line_course_sorter.sort(_iter_x10_records(
+                converter_context,
+                input_source,
+                'LID_VERLAUF.x10',
+                ['LI_NR', 'STR_LI_VAR', 'LI_LFD_NR', 'ONR_TYP_NR', 'ORT_NR'],
+                value_filter
+            ))
+
+        logging.info('sorting REC_LID.x10 ...')
+        with converter_context._stats.stage('sort:REC_LID'):
+            route_sorter.sort(_iter_x10_records(
+                converter_context,
+                input_source,
+                'REC_LID.x10',
+                ['LI_NR', 'LIDNAME', 'LI_RI_NR', 'LinienID', 'ROUTEN_NR', 'STR_LI_VAR'],
+                value_filter
+            ))
+
+        # only the geometries of recently used sections are kept, routes of the same line share most of them
+        idx_section_geometry = BoundedCache(low_memory_config.get('cache_size', 10000))
+
+        with converter_context._stats.stage('convert_routes'):
+            line_courses = ((k, list(g)) for k, g in itertools.groupby(line_course_sorter, _line_course_key))
+            line_course = next(line_courses, None)
+
+            for route_key, rec_lid_records in itertools.groupby(route_sorter, _line_course_key):
+                while line_course is not None and line_course[0] < route_key:
+                    line_course = next(line_courses, None)
+
+                lid_verlauf_items = line_course[1] if line_course is not None and line_course[0] == route_key else list()
+
+                for rec_lid_record in rec_lid_records:
+                    _convert_route(converter_context, rec_lid_record, idx_point_data, point_coordinates, idx_section_data, idx_section_intermediate_data, idx_section_geometry, _LineCourse(lid_verlauf_items))
+    finally:
+        line_course_sorter.close()
+        route_sorter.close()
+        connection.close()
+
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+def _line_course_key(record):
+    return record['LI_NR'], record['STR_LI_VAR']
+
+class _LineCourse:
+
+    # stands in for the LID_VERLAUF table while streaming, holding only the items of the current route
+    def __init__(self, lid_verlauf_items):
+        self.lid_verlauf_items = lid_verlauf_items
+
+    def find_records(self, rdata, primary_key=None):
+        return list(self.lid_verlauf_items)
+
+def _index_point_data(converter_context, input_source, connection, coordinates_filename, chunk_size):
+    logging.info('loading and indexing REC_ORT.x10 on disk ...')
+    idx_point_data = DiskIndex(connection, 'REC_ORT', 2, 3)
+    records = _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_ORT.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'ORT_REF_ORT_NAME', 'HST_NR_INTERNATIONAL', 'ORT_POS_LAENGE', 'ORT_POS_BREITE']
     )
 
-    logging.info('indexing point data ...')
+    # coordinates are decoded chunk by chunk and appended to a file which is memory-mapped afterwards
+    num_points = 0
+    with open(coordinates_filename, 'wb') as coordinates_file:
+        chunk = list(itertools.islice(records, chunk_size))
+        while len(chunk) > 0:
+            chunk_coordinates = numpy.empty((len(chunk), 2), dtype=numpy.float64)
+            chunk_coordinates[:, 0] = _convert_coordinates_vdv([r['ORT_POS_LAENGE'] for r in chunk])
+            chunk_coordinates[:, 1] = _convert_coordinates_vdv([r['ORT_POS_BREITE'] for r in chunk])
+            coordinates_file.write(chunk_coordinates.tobytes())
+
+            idx_point_data.insert((r['ONR_TYP_NR'], r['ORT_NR'], r['ORT_REF_ORT_NAME'], r['HST_NR_INTERNATIONAL'], num_points + i) for i, r in enumerate(chunk))
+
+            num_points = num_points + len(chunk)
+            chunk = list(itertools.islice(records, chunk_size))
+
+    idx_point_data.finish()
+
+    if num_points == 0:
+        return idx_point_data, numpy.empty((0, 2), dtype=numpy.float64)
+
+    return idx_point_data, numpy.memmap(coordinates_filename, dtype=numpy.float64, mode='r', shape=(num_points, 2))
+
+def _index_section_intermediate_data(converter_context, input_source, connection):
+    logging.info('loading and indexing REC_SEL_ZP.x10 on disk ...')
+    idx_section_intermediate_data = DiskIndex(connection, 'REC_SEL_ZP', 4, 2, True)
+    idx_section_intermediate_data.insert((r['ONR_TYP_NR'], r['ORT_NR'], r['SEL_ZIEL_TYP'], r['SEL_ZIEL'], r['ZP_TYP'], r['ZP_ONR']) for r in _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_SEL_ZP.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL', 'ZP_TYP', 'ZP_ONR']
+    ))
+
+    idx_section_intermediate_data.finish()
+
+    return idx_section_intermediate_data
+
+def _index_section_data(converter_context, input_source, connection):
+    logging.info('loading and indexing REC_SEL.x10 on disk ...')
+    idx_section_data = DiskIndex(connection, 'REC_SEL', 4, 1)
+    idx_section_data.insert((r['ONR_TYP_NR'], r['ORT_NR'], r['SEL_ZIEL_TYP'], r['SEL_ZIEL'], r['SEL_LAENGE']) for r in _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_SEL.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL', 'SEL_LAENGE']
+    ))
+
+    idx_section_data.finish()
+
+    return idx_section_data
+
+def _load_tables(converter_context, input_source, table_loaders):
+    global _worker_args
+
+    num_workers = min(converter_context._workers, len(table_loaders))
+    if num_workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        logging.info(f"loading {len(table_loaders)} tables using {num_workers} workers ...")
+
+        # the tables are independent, each one is parsed and indexed by its own worker and the results are sent back
+        _worker_args = (converter_context, input_source)
+        try:
+            with multiprocessing.get_context('fork').Pool(num_workers) as pool:
+                results = list()
+                for result, worker_stats in pool.map(_load_table, table_loaders, 1):
+                    converter_context._stats.merge(worker_stats)
+                    results.append(result)
+        finally:
+            _worker_args = None
+    else:
+        results = [_load_cached(converter_context, table_name, input_source, loader) for table_name, loader in table_loaders]
+
+    return {table_name: result for (table_name, _), result in zip(table_loaders, results)}
+
+def _load_table(table_loader):
+    converter_context, input_source = _worker_args
+    table_name, loader = table_loader
+
+    # forked workers must not share the file position of the parent's input archive
+    converter_context._stats = ConversionStats()
+
+    worker_input_source = input_source.reopen()
+    try:
+        return _load_cached(converter_context, table_name, worker_input_source, loader), converter_context._stats.as_dict()
+    finally:
+        worker_input_source.close()
+
+def _load_tables_filtered(converter_context, input_source, line_numbers):
+    logging.info(f"loading only the data referenced by {len(line_numbers)} lines ...")
+
+    # tables are loaded one after another, each one restricts the rows needed from the next one
+    tables = dict()
+    tables['REC_LID'] = _load_cached(converter_context, 'REC_LID', input_source, _load_lines, line_numbers)
+    tables['LID_VERLAUF'] = _load_cached(converter_context, 'LID_VERLAUF', input_source, _load_line_courses, line_numbers)
+
+    point_keys = set()
+    section_keys = set()
+    for rec_lid_record in tables['REC_LID']:
+        lid_verlauf_items = tables['LID_VERLAUF'].find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
+        stop_point_identifiers = [(i['ONR_TYP_NR'], i['ORT_NR']) for i in lid_verlauf_items]
+        point_keys.update(stop_point_identifiers)
+        section_keys.update(a + b for a, b in zip(stop_point_identifiers, stop_point_identifiers[1:]))
+
+    tables['REC_SEL'] = _load_cached(converter_context, 'REC_SEL', input_source, _load_section_data, section_keys)
+    tables['REC_SEL_ZP'] = _load_cached(converter_context, 'REC_SEL_ZP', input_source, _load_section_intermediate_data, section_keys)
+
+    for section_intermediate_points in tables['REC_SEL_ZP'].values():
+        point_keys.update(section_intermediate_points)
+
+    tables['REC_ORT'] = _load_cached(converter_context, 'REC_ORT', input_source, _load_point_data, point_keys)
+
+    return tables
+
+def _load_cached(converter_context, table_name, input_source, loader, *loader_args):
+    x10_config = converter_context._config['config']['x10']
+    x10_filename = f"{table_name}.x10"
+
+    start_time = time.perf_counter()
+
+    with converter_context._stats.stage(f"load:{table_name}"):
+        # filtered tables are never cached
+        if converter_context._cache is None or len(loader_args) > 0:
+            result = loader(converter_context, input_source, *loader_args)
+        else:
+            result = converter_context._cache.load(
+                table_name,
+                [(input_source.location(x10_filename), input_source.content_id(x10_filename))],
+                {
+                    'loader': loader.__name__,
+                    'null_value': x10_config['null_value'],
+                    'encoding': x10_config['encoding'],
+                    'storage': x10_config.get('storage', 'rows')
+                },
+                lambda: loader(converter_context, input_source)
+            )
+
+    logging.info(f"loaded {table_name} in {time.perf_counter() - start_time:.2f}s")
+
+    return result
+
+def _iter_x10_records(converter_context, input_source, x10_filename, columns, value_filter=None):
+    num_records = 0
+    try:
+        with input_source.open(x10_filename) as x10_stream:
+            for record in iter_x10_records(
+                x10_stream,
+                converter_context._config['config']['x10']['null_value'], 
+                converter_context._config['config']['x10']['encoding'],
+                columns,
+                value_filter
+            ):
+                num_records = num_records + 1
+                yield record
+    finally:
+        converter_context._stats.count(f"rows_parsed:{x10_filename}", num_records)
+
+def _load_point_data(converter_context, input_source, point_keys=None):
+    logging.info('loading and indexing REC_ORT.x10 ...')
     idx_point_data = dict()
-    for record in x10_REC_ORT.records:
+    point_longitudes = list()
+    point_latitudes = list()
+    for record in _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_ORT.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'ORT_REF_ORT_NAME', 'HST_NR_INTERNATIONAL', 'ORT_POS_LAENGE', 'ORT_POS_BREITE'],
+        _key_value_filter(point_keys)
+    ):
         identifier = (record['ONR_TYP_NR'], record['ORT_NR'])
+        if point_keys is not None and not identifier in point_keys:
+            continue
+
         idx_point_data[identifier] = (
             record['ORT_REF_ORT_NAME'],
             record['HST_NR_INTERNATIONAL'],
-            _convert_coordinate_vdv(record['ORT_POS_LAENGE']),
-            _convert_coordinate_vdv(record['ORT_POS_BREITE'])
+            len(point_longitudes)
         )
 
-    x10_REC_ORT.close()
-    
-    # export shapes if configured
-    if converter_context._config['data']['extract_shapes']:
-        # generate network index ...
-        logging.info('loading REC_SEL_ZP.x10 ...')
-        x10_REC_SEL_ZP = read_x10_file(
-            os.path.join(input_directory, 'REC_SEL_ZP.x10'),
-            converter_context._config['config']['x10']['null_value'], 
-            converter_context._config['config']['x10']['encoding']
+        point_longitudes.append(record['ORT_POS_LAENGE'])
+        point_latitudes.append(record['ORT_POS_BREITE'])
+
+    # decode all coordinates at once, points refer to their row in this array by index
+    point_coordinates = numpy.empty((len(point_longitudes), 2), dtype=numpy.float64)
+    point_coordinates[:, 0] = _convert_coordinates_vdv(point_longitudes)
+    point_coordinates[:, 1] = _convert_coordinates_vdv(point_latitudes)
+
+    return idx_point_data, point_coordinates
+
+def _load_section_intermediate_data(converter_context, input_source, section_keys=None):
+    logging.info('loading and indexing REC_SEL_ZP.x10 ...')
+    idx_section_intermediate_data = dict()
+    for record in _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_SEL_ZP.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL', 'ZP_TYP', 'ZP_ONR'],
+        _key_value_filter(section_keys)
+    ):
+        identifier = (record['ONR_TYP_NR'], record['ORT_NR'], record['SEL_ZIEL_TYP'], record['SEL_ZIEL'])
+        if section_keys is not None and not identifier in section_keys:
+            continue
+
+        if not identifier in idx_section_intermediate_data.keys():
+            idx_section_intermediate_data[identifier] = list()
+            
+        idx_section_intermediate_data[identifier].append((record['ZP_TYP'], record['ZP_ONR']))
+
+    return idx_section_intermediate_data
+
+def _load_section_data(converter_context, input_source, section_keys=None):
+    logging.info('loading and indexing REC_SEL.x10 ...')
+    idx_section_data = dict()
+    for record in _iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_SEL.x10',
+        ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL', 'SEL_LAENGE'],
+        _key_value_filter(section_keys)
+    ):
+        identifier = (record['ONR_TYP_NR'], record['ORT_NR'], record['SEL_ZIEL_TYP'], record['SEL_ZIEL'])
+        if section_keys is not None and not identifier in section_keys:
+            continue
+
+        idx_section_data[identifier] = (
+            record['SEL_LAENGE'],
         )
 
-        logging.info('indexing section intermediate points ...')
-        idx_section_intermediate_data = dict()
-        for record in x10_REC_SEL_ZP.records:
-            identifier = (record['ONR_TYP_NR'], record['ORT_NR'], record['SEL_ZIEL_TYP'], record['SEL_ZIEL'])
-            if not identifier in idx_section_intermediate_data.keys():
-                idx_section_intermediate_data[identifier] = list()
-                
-            idx_section_intermediate_data[identifier].append((record['ZP_TYP'], record['ZP_ONR']))
-
-        x10_REC_SEL_ZP.close()
+    return idx_section_data
 
-        logging.info('loading REC_SEL.x10 ...')
-        x10_REC_SEL = read_x10_file(
-            os.path.join(input_directory, 'REC_SEL.x10'),
+def _load_line_courses(converter_context, input_source, line_numbers=None):
+    logging.info('loading LID_VERLAUF.x10 ...')
+    with input_source.open('LID_VERLAUF.x10') as x10_stream:
+        x10_LID_VERLAUF = read_x10_file(
+            x10_stream,
             converter_context._config['config']['x10']['null_value'], 
-            converter_context._config['config']['x10']['encoding']
+            converter_context._config['config']['x10']['encoding'],
+            ['LI_NR', 'STR_LI_VAR', 'ONR_TYP_NR', 'ORT_NR'],
+            converter_context._config['config']['x10'].get('storage', 'rows'),
+            {'LI_NR': line_numbers} if line_numbers is not None else None
         )
 
-        logging.info('indexing sections ...')
-        idx_section_data = dict()
-        for record in x10_REC_SEL.records:
-            identifier = (record['ONR_TYP_NR'], record['ORT_NR'], record['SEL_ZIEL_TYP'], record['SEL_ZIEL'])
-            idx_section_data[identifier] = (
-                record['SEL_LAENGE'],
-            )
+    converter_context._stats.count('rows_parsed:LID_VERLAUF.x10', len(x10_LID_VERLAUF.records))
 
-        x10_REC_SEL.close()
+    with converter_context._stats.stage('index:LID_VERLAUF'):
+        x10_LID_VERLAUF.create_index(['LI_NR', 'STR_LI_VAR'])
 
-        logging.info('loading REC_LID.x10 ...')
-        x10_REC_LID = read_x10_file(
-            os.path.join(input_directory, 'REC_LID.x10'),
-            converter_context._config['config']['x10']['null_value'], 
-            converter_context._config['config']['x10']['encoding']
-        )
+    return x10_LID_VERLAUF
 
-        logging.info('loading LID_VERLAUF.x10 ...')
-        x10_LID_VERLAUF = read_x10_file(
-            os.path.join(input_directory, 'LID_VERLAUF.x10'),
-            converter_context._config['config']['x10']['null_value'], 
-            converter_context._config['config']['x10']['encoding']
-        )
+def _load_lines(converter_context, input_source, line_numbers=None):
+    logging.info('loading REC_LID.x10 ...')
+    return list(_iter_x10_records(
+        converter_context,
+        input_source,
+        'REC_LID.x10',
+        ['LI_NR', 'LIDNAME', 'LI_RI_NR', 'LinienID', 'ROUTEN_NR', 'STR_LI_VAR'],
+        {'LI_NR': line_numbers} if line_numbers is not None else None
+    ))
 
-        # run over each line ...
-        for rec_lid_record in x10_REC_LID.records:
-            line_nr = rec_lid_record['LI_NR']
-            line_name = rec_lid_record['LIDNAME']
-            line_direction = rec_lid_record['LI_RI_NR']
-            line_id = rec_lid_record['LinienID'] if 'LinienID' in rec_lid_record else ''
-            route_nr = rec_lid_record['ROUTEN_NR']
-            route_name = rec_lid_record['STR_LI_VAR']
+def _key_value_filter(keys):
+    # rows are pre-filtered by their ORT_NR while parsing, the complete key is checked by the loader
+    if keys is None:
+        return None
 
-            # check for active line filter
-            if len(line_filter) > 0 and not line_nr in line_filter:
-                continue
+    return {'ORT_NR': set(k[1] for k in keys)}
 
-            route_coordinates = list()
-            route_intermediate_stops_meta = list()
+def _convert_coordinates_vdv(inputs):
+    inputs = numpy.array(inputs, dtype=numpy.int64)
+    absolute_inputs = numpy.abs(inputs)
 
-            logging.info(f"found (LineNr-LineDirection-LineVariantName) {line_nr}-{line_direction}-{route_name} - converting now ...")
+    # DDDMMSSsss, decoded with integer arithmetic but combined in the same order as _convert_coordinate_vdv
+    degrees = (absolute_inputs // 10000000).astype(numpy.float64)
+    minutes = ((absolute_inputs // 100000) % 100).astype(numpy.float64)
+    seconds = (absolute_inputs % 100000).astype(numpy.float64) / 1000.0
 
-            lid_verlauf_items = x10_LID_VERLAUF.find_records(rec_lid_record, ['LI_NR', 'STR_LI_VAR'])
-            
-            # initialize 
-            last_stop_point_identifier = (lid_verlauf_items[0]['ONR_TYP_NR'], lid_verlauf_items[0]['ORT_NR'])
-            last_stop_point = idx_point_data[last_stop_point_identifier]
-
-            stop_dist_travelled = 0.0
-
-            # add first stop to all required datasets
-            intermediate_stop_id = lid_verlauf_items[0]['ORT_NR']
-            if converter_context._config['config']['prefer_international_ids'] and not last_stop_point[1] == '':
-                intermediate_stop_id = last_stop_point[1]
-
-            route_coordinates.append([
-                last_stop_point[2],
-                last_stop_point[3]
-            ])
-
-            route_intermediate_stops_meta.append({
-                'stop_id': intermediate_stop_id,
-                'shape_dist_traveled': stop_dist_travelled
-            })
-
-            # run over remaining items
-            for lid_verlauf_item in lid_verlauf_items[1:]:
-                stop_point_identifier = (lid_verlauf_item['ONR_TYP_NR'], lid_verlauf_item['ORT_NR'])
-                stop_point = idx_point_data[stop_point_identifier]
-
-                # select route section point
-                section = idx_section_data[last_stop_point_identifier + stop_point_identifier]
-
-                if (last_stop_point_identifier + stop_point_identifier) in idx_section_intermediate_data.keys():
-                    section_intermediate_points = idx_section_intermediate_data[last_stop_point_identifier + stop_point_identifier]
-                else:
-                    section_intermediate_points = list()
-
-                # increase distance
-                stop_dist_travelled = stop_dist_travelled + section[0]
-
-                # if there were some intermediate points find
-                section_intermediate_point_coordinates = list()
-                if len(section_intermediate_points) > 0:
-                    # select route section intermediate points
-                    for intermediate_point_reference in section_intermediate_points:
-                        intermediate_point = idx_point_data[intermediate_point_reference]
-
-                        section_intermediate_point_coordinates.append([
-                            intermediate_point[2],
-                            intermediate_point[3]
-                        ])
-                else:
-                    # if there was no intermediate point added, add the current stop point instead
-                    section_intermediate_point_coordinates.append([
-                        stop_point[2],
-                        stop_point[3]
-                    ])
-
-                route_coordinates = route_coordinates + section_intermediate_point_coordinates
-
-                # generate meta data
-                intermediate_stop_id = lid_verlauf_item['ORT_NR']
-                if converter_context._config['config']['prefer_international_ids'] and not stop_point[1] == '':
-                    intermediate_stop_id = stop_point[1]
-
-                route_intermediate_stops_meta.append({
-                    'stop_id': intermediate_stop_id,
-                    'shape_dist_traveled': (stop_dist_travelled / 1000.0)
-                })
-
-                # set last_stop_point in order to process next section
-                last_stop_point_identifier = stop_point_identifier
-                last_stop_point = stop_point
-
-            # add GeoJSON feature
-            meta_data = dict({
-                'line_nr': line_nr,
-                'line_name': line_name,
-                'line_id': line_id,
-                'line_direction': line_direction,
-                'route_nr': route_nr,
-                'route_name': route_name,
-            })
-
-            if converter_context._config['data']['extract_shapes_intermediate_stops']:
-                meta_data['intermediate_stops'] = route_intermediate_stops_meta
-
-            converter_context._add_linestring_feature(route_coordinates, meta_data)
-
-            # write GeoJOSN file finally
-            geojson_filename = f"{line_nr}-{line_direction}-{route_name}.geojson"
-            converter_context._write_linestring_geojson_file(os.path.join(output_directory, geojson_filename))
+    coordinates = degrees + (minutes / 60.0) + (seconds / 3600.0) * numpy.where(inputs < 0, -1.0, 1.0)
+
+    # values with more than ten digits do not follow the fixed layout
+    for i in numpy.flatnonzero(absolute_inputs >= 10000000000):
+        coordinates[i] = _convert_coordinate_vdv(int(inputs[i]))
+
+    return coordinates
 
 def _convert_coordinate_vdv(input):
     input_string = str(input)
@@ -0,0 +1,145 @@
+import collections
+import heapq
+import itertools
+import os
+import pickle
+import sqlite3
+
+########################################################################################################################
+# Helper classes for sorting and indexing data on disk, used for converting datasets which do not fit into memory.
+########################################################################################################################
+
+class ExternalSorter:
+
+    def __init__(self, temp_directory, key, chunk_size=100000):
+        self.temp_directory = temp_directory
+        self.key = key
+        self.chunk_size = chunk_size
+
+        self._run_filenames = list()
+        self._last_run = list()
+
+    def sort(self, items):
+        # items are sorted in chunks, all chunks but the last one are spilled to disk as sorted runs
+        items = iter(items)
+        chunk = list(itertools.islice(items, self.chunk_size))
+        while len(chunk) > 0:
+            chunk.sort(key=self.key)
+
+            next_chunk = list(itertools.islice(items, self.chunk_size))
+            if len(next_chunk) > 0 or len(self._last_run) > 0:
+                self._write_run(chunk)
+            else:
+                self._last_run = chunk
+
+            chunk = next_chunk
+
+    def close(self):
+        for run_filename in self._run_filenames:
+            if os.path.isfile(run_filename):
+                os.remove(run_filename)
+
+        self._run_filenames = list()
+        self._last_run = list()
+
+    def __iter__(self):
+        # runs are merged in the order they were written, so that items with equal keys keep their input order
+        runs = [self._read_run(f) for f in self._run_filenames] + [iter(self._last_run)]
+        return heapq.merge(*runs, key=self.key)
+
+    def _write_run(self, chunk):
+        run_filename = os.path.join(self.temp_directory, f"run-{id(self)}-{len(self._run_filenames)}.pickle")
+        with open(run_filename, 'wb') as run_file:
+            for item in chunk:
+                pickle.dump(item, run_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._run_filenames.append(run_filename)
+
+    def _read_run(self, run_filename):
+        with open(run_filename, 'rb') as run_file:
+            while True:
+                try:
+                    yield pickle.load(run_file)
+                except EOFError:
+                    return
+
+class DiskIndex:
+
+    def __init__(self, connection, name, num_key_columns, num_value_columns, multiple=False):
+        self.name = name
+        self.multiple = multiple
+
+        self._connection = connection
+
+        key_columns = [f"k{i}" for i in range(num_key_columns)]
+        value_columns = [f"v{i}" for i in range(num_value_columns)]
+
+        # columns are declared without a type, so that SQLite returns the values with their original Python types
+        if self.multiple:
+            self._connection.execute(f"CREATE TABLE {name} ({', '.join(key_columns + value_columns)})")
+        else:
+            self._connection.execute(f"CREATE TABLE {name} ({', '.join(key_columns + value_columns)}, PRIMARY KEY ({', '.join(key_columns)}))")
+
+        placeholders = ', '.join(['?'] * (num_key_columns + num_value_columns))
+        key_condition = ' AND '.join(f"{c} = ?" for c in key_columns)
+
+        # later rows replace earlier ones with the same key, like they do in a dict
+        self._insert_statement = f"INSERT {'' if self.multiple else 'OR REPLACE '}INTO {name} VALUES ({placeholders})"
+        self._select_statement = f"SELECT {', '.join(value_columns)} FROM {name} WHERE {key_condition} ORDER BY rowid"
+        self._create_index_statement = f"CREATE INDEX {name}_key ON {name} ({', '.join(key_columns)})"
+
+    def insert(self, rows):
+        # rows are tuples of the key values followed by the values
+        self._connection.executemany(self._insert_statement, rows)
+
+    def finish(self):
+        if self.multiple:
+            self._connection.execute(self._create_index_statement)
+
+        self._connection.commit()
+
+    def get(self, key, default=None):
+        rows = self._connection.execute(self._select_statement, key).fetchall()
+        if len(rows) == 0:
+            return default
+
+        return rows if self.multiple else rows[0]
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+def open_disk_index_database(temp_directory):
+    connection = sqlite3.connect(os.path.join(temp_directory, 'index.sqlite'))
+
+    # the database is thrown away after the conversion, so durability is not needed
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+
+    return connection
+
+class BoundedCache(collections.OrderedDict):
+
+    def __init__(self, max_size):
+        super().__init__()
+
+        self.max_size = max_size
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+
+        if len(self) > self.max_size:
+            self.popitem(last=False)
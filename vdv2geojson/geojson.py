@@ -0,0 +1,126 @@
+import json
+import numpy
+
+########################################################################################################################
+# Helper classes for writing GeoJSON feature collections and sequences feature by feature.
+########################################################################################################################
+
+class GeoJsonFeatureCollectionWriter:
+
+    def __init__(self, geojson_file, compact=False, coordinate_precision=None):
+        self.compact = compact
+        self.coordinate_precision = coordinate_precision
+
+        self._geojson_file = geojson_file
+        self._num_features = 0
+
+        self.num_bytes = 0
+
+        # the indented layout is the same as json.dump(..., indent=4) of the whole feature collection
+        if self.compact:
+            self._encoder = json.JSONEncoder(separators=(',', ':'))
+            self._write('{"type":"FeatureCollection","features":[')
+        else:
+            self._encoder = json.JSONEncoder(indent=4)
+            self._write('{\n    "type": "FeatureCollection",\n    "features": [')
+
+    def write_feature(self, feature):
+        self.write_encoded_feature(self.encode_feature(feature))
+
+    def encode_feature(self, feature):
+        if self.coordinate_precision is not None:
+            feature = round_feature_coordinates(feature, self.coordinate_precision)
+
+        if self.compact:
+            return self._encoder.encode(feature)
+        else:
+            return self._encoder.encode(feature).replace('\n', '\n        ')
+
+    def write_encoded_feature(self, encoded_feature):
+        if self.compact:
+            self._write(',' if self._num_features > 0 else '')
+        else:
+            self._write(',\n        ' if self._num_features > 0 else '\n        ')
+
+        self._write(encoded_feature)
+
+        self._num_features = self._num_features + 1
+
+    def close(self):
+        if self.compact:
+            self._write(']}')
+        elif self._num_features > 0:
+            self._write('\n    ]\n}')
+        else:
+            self._write(']\n}')
+
+    def _write(self, data):
+        self.num_bytes = self.num_bytes + write_json_text(self._geojson_file, data)
+
+class GeoJsonSequenceWriter:
+
+    def __init__(self, geojson_file, record_separator='', coordinate_precision=None):
+        self.record_separator = record_separator
+        self.coordinate_precision = coordinate_precision
+
+        self._geojson_file = geojson_file
+        self._num_features = 0
+
+        self.num_bytes = 0
+
+        # one feature per line, see RFC 8142 for GeoJSON text sequences using the record separator
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def write_feature(self, feature):
+        self.write_encoded_feature(self.encode_feature(feature))
+
+    def encode_feature(self, feature):
+        if self.coordinate_precision is not None:
+            feature = round_feature_coordinates(feature, self.coordinate_precision)
+
+        return self._encoder.encode(feature)
+
+    def write_encoded_feature(self, encoded_feature):
+        self._write(f"{self.record_separator}{encoded_feature}\n")
+
+        self._num_features = self._num_features + 1
+
+    def close(self):
+        pass
+
+    def _write(self, data):
+        self.num_bytes = self.num_bytes + write_json_text(self._geojson_file, data)
+
+def write_json_text(json_file, data):
+    # the JSON encoder escapes all non-ASCII characters, so the number of characters is the number of bytes
+    json_file.write(data)
+
+    return len(data)
+
+def round_feature_coordinates(feature, coordinate_precision):
+    geometry = feature['geometry']
+    if geometry is None:
+        return feature
+
+    rounded_feature = dict(feature)
+    rounded_feature['geometry'] = _round_geometry_coordinates(geometry, coordinate_precision)
+
+    return rounded_feature
+
+def _round_geometry_coordinates(geometry, coordinate_precision):
+    rounded_geometry = dict(geometry)
+
+    # parts of multi-part geometries may differ in length, so each part is rounded as an array of its own
+    if geometry['type'] == 'GeometryCollection':
+        rounded_geometry['geometries'] = [_round_geometry_coordinates(g, coordinate_precision) for g in geometry['geometries']]
+    elif geometry['type'] in ('MultiLineString', 'Polygon'):
+        rounded_geometry['coordinates'] = [_round_coordinates(part, coordinate_precision) for part in geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        rounded_geometry['coordinates'] = [[_round_coordinates(ring, coordinate_precision) for ring in polygon] for polygon in geometry['coordinates']]
+    else:
+        rounded_geometry['coordinates'] = _round_coordinates(geometry['coordinates'], coordinate_precision)
+
+    return rounded_geometry
+
+def _round_coordinates(coordinates, coordinate_precision):
+    return numpy.round(numpy.asarray(coordinates, dtype=numpy.float64), coordinate_precision).tolist()
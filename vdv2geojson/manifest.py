@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+
+########################################################################################################################
+# Manifest of converted routes and the content hashes of their inputs, used for incremental conversion.
+########################################################################################################################
+
+# increase whenever the route content hashes are computed differently, so that all routes are converted again
+MANIFEST_VERSION = 1
+
+class RouteManifest:
+
+    def __init__(self, manifest_filename, config_hash):
+        self.manifest_filename = manifest_filename
+        self.config_hash = config_hash
+
+        self._routes = dict()
+
+        if os.path.isfile(self.manifest_filename):
+            try:
+                with open(self.manifest_filename, 'r', encoding='utf-8') as manifest_file:
+                    manifest = json.load(manifest_file)
+
+                # a changed config may change every route, so the previous entries are only used with the same config
+                if manifest.get('version') == MANIFEST_VERSION and manifest.get('config_hash') == self.config_hash:
+                    self._routes = manifest['routes']
+                else:
+                    logging.info('manifest was created with a different config, converting all routes')
+            except (OSError, ValueError, KeyError) as ex:
+                logging.warning(f"could not load manifest {self.manifest_filename}: {ex}")
+
+    def is_unchanged(self, geojson_filename, content_hash):
+        return geojson_filename in self._routes and self._routes[geojson_filename]['hash'] == content_hash
+
+    def update(self, geojson_filename, route_key, content_hash):
+        self._routes[geojson_filename] = {
+            'route': list(route_key),
+            'hash': content_hash
+        }
+
+    def retain(self, geojson_filenames, line_numbers=None):
+        # with line numbers given, entries of other lines are kept as they were not part of this run
+        removed_filenames = [
+            f for f, r in self._routes.items()
+            if f not in geojson_filenames and (not line_numbers or r['route'][0] in line_numbers)
+        ]
+        for geojson_filename in removed_filenames:
+            del self._routes[geojson_filename]
+
+        return removed_filenames
+
+    def save(self):
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'config_hash': self.config_hash,
+            'routes': self._routes
+        }
+
+        # write to a temporary file first, so that an interrupted run never leaves a partial manifest
+        temp_filename = f"{self.manifest_filename}.{os.getpid()}.tmp"
+        with open(temp_filename, 'w', encoding='utf-8') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+
+        os.replace(temp_filename, self.manifest_filename)
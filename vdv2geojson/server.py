@@ -0,0 +1,198 @@
+import collections
+import io
+import json
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import unquote
+from urllib.parse import urlparse
+
+from vdv2geojson.geojson import GeoJsonFeatureCollectionWriter
+from vdv2geojson.source import open_input_source
+
+########################################################################################################################
+# HTTP server answering route GeoJSON requests from indexes which are loaded once and kept in memory.
+########################################################################################################################
+
+class RouteServer:
+
+    def __init__(self, converter, input, cache_size=1024):
+        self.input = input
+        self.cache_size = cache_size
+
+        self._converter = converter
+        self._dialect = self._load_dialect(converter._dialect)
+
+        self._lock = threading.Lock()
+
+        self._routes = list()
+        self._route_args = None
+        self._idx_line_routes = dict()
+        self._idx_routes = dict()
+        self._feature_cache = collections.OrderedDict()
+
+        self.reload()
+
+    def reload(self):
+        logging.info(f"loading VDV data from {self.input} ...")
+
+        # the new data is loaded while requests are still answered from the previous data
+        input_source = open_input_source(self.input)
+        try:
+            dataset = self._dialect.load(self._converter, input_source)
+        finally:
+            input_source.close()
+
+        if dataset is None:
+            routes, route_args = list(), None
+        else:
+            routes, route_args = dataset
+
+        idx_line_routes = dict()
+        idx_routes = dict()
+        for route_index, rec_lid_record in enumerate(routes):
+            idx_line_routes.setdefault(rec_lid_record['LI_NR'], list()).append(route_index)
+            idx_routes.setdefault((rec_lid_record['LI_NR'], rec_lid_record['LI_RI_NR'], rec_lid_record['STR_LI_VAR']), list()).append(route_index)
+
+        with self._lock:
+            self._routes = routes
+            self._route_args = route_args
+            self._idx_line_routes = idx_line_routes
+            self._idx_routes = idx_routes
+            self._feature_cache = collections.OrderedDict()
+
+        logging.info(f"loaded {len(routes)} routes")
+
+        return len(routes)
+
+    def line_features(self, line_nr):
+        with self._lock:
+            routes, route_args, feature_cache = self._routes, self._route_args, self._feature_cache
+            route_indices = self._idx_line_routes.get(line_nr, list())
+
+        return [self._route_feature(routes, route_args, feature_cache, i) for i in route_indices]
+
+    def route_features(self, line_nr, line_direction, route_name):
+        with self._lock:
+            routes, route_args, feature_cache = self._routes, self._route_args, self._feature_cache
+            route_indices = self._idx_routes.get((line_nr, line_direction, route_name), list())
+
+        return [self._route_feature(routes, route_args, feature_cache, i) for i in route_indices]
+
+    def serve(self, host='127.0.0.1', port=8080):
+        http_server = ThreadingHTTPServer((host, port), RouteRequestHandler)
+        http_server.route_server = self
+
+        logging.info(f"serving routes on http://{host}:{port}/ ...")
+
+        try:
+            http_server.serve_forever()
+        finally:
+            http_server.server_close()
+
+    def _route_feature(self, routes, route_args, feature_cache, route_index):
+        # features are simplified only once and kept in a LRU cache, the lock is only held for accessing the cache
+        with self._lock:
+            if route_index in feature_cache:
+                feature_cache.move_to_end(route_index)
+                return feature_cache[route_index]
+
+        # features are created from the data the request started with, even if it is reloaded meanwhile
+        feature = self._dialect.create_route_feature(self._converter, routes[route_index], route_args)
+
+        with self._lock:
+            # the cache of data replaced by a reload is not filled anymore
+            if feature_cache is self._feature_cache:
+                feature_cache[route_index] = feature
+                if len(feature_cache) > self.cache_size:
+                    feature_cache.popitem(last=False)
+
+        return feature
+
+    def _load_dialect(self, dialect):
+        if dialect == 'vdvstandard':
+            from vdv2geojson.dialect import vdvstandard
+            return vdvstandard
+        else:
+            raise ValueError(f"unknown dialect {dialect}")
+
+class RouteRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = [unquote(p) for p in urlparse(self.path).path.split('/') if p != '']
+        route_server = self.server.route_server
+
+        try:
+            if len(path) == 2 and path[0] == 'lines':
+                line_nr = int(path[1])
+            elif len(path) == 4 and path[0] == 'routes':
+                line_nr, line_direction, route_name = int(path[1]), int(path[2]), path[3]
+            else:
+                self._send_json(404, {'error': f"unknown path {self.path}"})
+                return
+        except ValueError:
+            self._send_json(400, {'error': f"invalid path {self.path}"})
+            return
+
+        # errors while creating the features are caused by the data or the config, not by the request
+        try:
+            if path[0] == 'lines':
+                features = route_server.line_features(line_nr)
+            else:
+                features = route_server.route_features(line_nr, line_direction, route_name)
+        except KeyError as ex:
+            logging.error(f"broken references in VDV data: {ex}")
+            self._send_json(500, {'error': f"broken references in VDV data: {ex}"})
+            return
+        except Exception as ex:
+            logging.exception(f"could not create route features for {self.path}")
+            self._send_json(500, {'error': f"could not create route features: {ex}"})
+            return
+
+        if len(features) == 0:
+            self._send_json(404, {'error': f"no routes found for {self.path}"})
+            return
+
+        self._send_geojson(features)
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') == '/reload':
+            try:
+                num_routes = self.server.route_server.reload()
+            except Exception as ex:
+                # the previous data is still served if it could not be reloaded
+                logging.exception("could not reload VDV data")
+                self._send_json(500, {'error': f"could not reload VDV data: {ex}"})
+                return
+
+            self._send_json(200, {'routes': num_routes})
+        else:
+            self._send_json(404, {'error': f"unknown path {self.path}"})
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} - {format % args}")
+
+    def _send_geojson(self, features):
+        geojson_config = self.server.route_server._converter._config['config'].get('geojson', dict())
+
+        geojson_buffer = io.StringIO()
+        geojson_writer = GeoJsonFeatureCollectionWriter(geojson_buffer, True, geojson_config.get('coordinate_precision', None))
+        for feature in features:
+            geojson_writer.write_feature(feature)
+
+        geojson_writer.close()
+
+        self._send(200, 'application/geo+json', geojson_buffer.getvalue().encode('utf-8'))
+
+    def _send_json(self, status, data):
+        self._send(status, 'application/json', json.dumps(data).encode('utf-8'))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
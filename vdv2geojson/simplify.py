@@ -0,0 +1,134 @@
+import heapq
+import math
+import numpy
+
+########################################################################################################################
+# Helper functions for simplifying shapes.
+########################################################################################################################
+
+EARTH_RADIUS = 6371008.8
+
+def simplify_linestring(coordinates, epsilon, algorithm='douglas-peucker', unit='degrees'):
+    points = numpy.asarray(coordinates, dtype=numpy.float64)
+
+    if len(points) < 3:
+        return points.tolist()
+
+    if unit == 'metres':
+        metric_points = _project_metres(points)
+    elif unit == 'degrees':
+        metric_points = points
+    else:
+        raise ValueError(f"unknown simplification unit {unit}")
+
+    if algorithm == 'douglas-peucker':
+        mask = douglas_peucker_mask(metric_points, epsilon)
+    elif algorithm == 'visvalingam-whyatt':
+        mask = visvalingam_whyatt_mask(metric_points, epsilon * epsilon)
+    else:
+        raise ValueError(f"unknown simplification algorithm {algorithm}")
+
+    return points[mask].tolist()
+
+def douglas_peucker_mask(points, epsilon):
+    num_points = points.shape[0]
+    mask = numpy.ones(num_points, dtype=bool)
+
+    if num_points < 3:
+        return mask
+
+    xs = points[:, 0]
+    ys = points[:, 1]
+
+    stack = [(0, num_points - 1)]
+    while stack:
+        start_index, last_index = stack.pop()
+
+        if last_index - start_index < 2:
+            continue
+
+        start = points[start_index]
+        end = points[last_index]
+
+        px = xs[start_index + 1:last_index]
+        py = ys[start_index + 1:last_index]
+
+        # same arithmetic as rdp.pldist, so that the same vertices are kept for the same epsilon
+        if start[0] == end[0] and start[1] == end[1]:
+            distances = numpy.linalg.norm(points[start_index + 1:last_index] - start, axis=1)
+        else:
+            dx = end[0] - start[0]
+            dy = end[1] - start[1]
+
+            distances = numpy.abs(dx * (start[1] - py) - dy * (start[0] - px)) / numpy.linalg.norm(end - start)
+
+        index = int(numpy.argmax(distances))
+        if distances[index] > epsilon:
+            index = start_index + 1 + index
+
+            stack.append((start_index, index))
+            stack.append((index, last_index))
+        else:
+            mask[start_index + 1:last_index] = False
+
+    return mask
+
+def visvalingam_whyatt_mask(points, area_threshold):
+    num_points = points.shape[0]
+    mask = numpy.ones(num_points, dtype=bool)
+
+    if num_points < 3:
+        return mask
+
+    # effective areas of all inner points at once, updated incrementally afterwards
+    areas = numpy.full(num_points, numpy.inf)
+    areas[1:-1] = _triangle_areas(points[:-2], points[1:-1], points[2:])
+
+    coordinates = points.tolist()
+
+    previous_points = list(range(-1, num_points - 1))
+    next_points = list(range(1, num_points + 1))
+
+    heap = [(area, i) for i, area in enumerate(areas[1:-1].tolist(), 1) if area < area_threshold]
+    heapq.heapify(heap)
+
+    while heap:
+        area, i = heapq.heappop(heap)
+
+        # skip outdated heap entries of points which were removed or updated in the meantime
+        if not mask[i] or area != areas[i]:
+            continue
+
+        mask[i] = False
+
+        p = previous_points[i]
+        n = next_points[i]
+
+        next_points[p] = n
+        previous_points[n] = p
+
+        for j in (p, n):
+            if 0 < j < num_points - 1:
+                # the area of a neighbour must not fall below the area of the point just removed
+                areas[j] = max(area, _triangle_area(coordinates[previous_points[j]], coordinates[j], coordinates[next_points[j]]))
+
+                if areas[j] < area_threshold:
+                    heapq.heappush(heap, (areas[j], j))
+
+    return mask
+
+def _triangle_areas(a, b, c):
+    return numpy.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / 2.0
+
+def _triangle_area(a, b, c):
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+def _project_metres(points):
+    # equirectangular projection around the mean latitude, accurate enough for shapes of single routes
+    reference_latitude = math.radians(float(numpy.mean(points[:, 1])))
+
+    projected_points = numpy.empty_like(points)
+    projected_points[:, 0] = numpy.radians(points[:, 0]) * EARTH_RADIUS * math.cos(reference_latitude)
+    projected_points[:, 1] = numpy.radians(points[:, 1]) * EARTH_RADIUS
+
+    return projected_points
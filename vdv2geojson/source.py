@@ -0,0 +1,103 @@
+import hashlib
+import os
+import zipfile
+
+########################################################################################################################
+# Input sources providing the *.x10 files of a dataset either from a directory or directly from a ZIP archive.
+########################################################################################################################
+
+_content_hashes = dict()
+
+def open_input_source(input):
+    if input.lower().endswith('.zip'):
+        return ZipInputSource(input)
+    else:
+        return DirectoryInputSource(input)
+
+def file_content_hash(filename):
+    # hashing the content instead of relying on mtime keeps cache entries valid when files are unpacked again
+    stat = os.stat(filename)
+    stat_key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+    if stat_key not in _content_hashes:
+        content_hash = hashlib.sha1()
+        content_hash.update(str(stat.st_size).encode('utf-8'))
+
+        with open(filename, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(1024 * 1024), b''):
+                content_hash.update(chunk)
+
+        _content_hashes[stat_key] = content_hash.hexdigest()
+
+    return _content_hashes[stat_key]
+
+def zip_member_content_hash(zip_file, zip_info):
+    # members are identified by their own content, so that the same table in different archives shares cache entries
+    stat = os.stat(zip_file.filename)
+    stat_key = (os.path.abspath(zip_file.filename), stat.st_size, stat.st_mtime_ns, zip_info.filename)
+
+    if stat_key not in _content_hashes:
+        content_hash = hashlib.sha1()
+        content_hash.update(str(zip_info.file_size).encode('utf-8'))
+
+        with zip_file.open(zip_info, 'r') as member_file:
+            for chunk in iter(lambda: member_file.read(1024 * 1024), b''):
+                content_hash.update(chunk)
+
+        _content_hashes[stat_key] = content_hash.hexdigest()
+
+    return _content_hashes[stat_key]
+
+class DirectoryInputSource:
+
+    def __init__(self, input_directory):
+        self.input_directory = input_directory
+
+    def open(self, name):
+        return open(os.path.join(self.input_directory, name), 'rb')
+
+    def location(self, name):
+        return os.path.abspath(os.path.join(self.input_directory, name))
+
+    def content_id(self, name):
+        return file_content_hash(os.path.join(self.input_directory, name))
+
+    def reopen(self):
+        return DirectoryInputSource(self.input_directory)
+
+    def close(self):
+        pass
+
+class ZipInputSource:
+
+    def __init__(self, zip_filename):
+        self.zip_filename = zip_filename
+
+        self._zip_file = zipfile.ZipFile(zip_filename, 'r')
+
+        # members are looked up by their file name, so that archives with a top level folder work as well
+        self._members = dict()
+        for zip_info in self._zip_file.infolist():
+            if not zip_info.is_dir():
+                self._members.setdefault(os.path.basename(zip_info.filename), zip_info)
+
+    def open(self, name):
+        if name not in self._members:
+            raise FileNotFoundError(f"{name} not found in ZIP archive {self.zip_filename}")
+
+        return self._zip_file.open(self._members[name], 'r')
+
+    def location(self, name):
+        return f"{os.path.abspath(self.zip_filename)}/{name}"
+
+    def content_id(self, name):
+        if name not in self._members:
+            raise FileNotFoundError(f"{name} not found in ZIP archive {self.zip_filename}")
+
+        return zip_member_content_hash(self._zip_file, self._members[name])
+
+    def reopen(self):
+        return ZipInputSource(self.zip_filename)
+
+    def close(self):
+        self._zip_file.close()
@@ -0,0 +1,84 @@
+import contextlib
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+########################################################################################################################
+# Helper class for collecting per-stage timings, memory usage and counters of a conversion.
+########################################################################################################################
+
+class ConversionStats:
+
+    def __init__(self):
+        self.stages = dict()
+        self.counters = dict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        start_peak_rss = _peak_rss_mb()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_growth_mb': None})
+            stage['calls'] = stage['calls'] + 1
+            stage['wall_seconds'] = stage['wall_seconds'] + (time.perf_counter() - start_wall_time)
+            stage['cpu_seconds'] = stage['cpu_seconds'] + (time.process_time() - start_cpu_time)
+            # the peak resident set size only grows over the process lifetime, a stage staying below an earlier peak adds nothing
+            stage['peak_rss_growth_mb'] = _max(stage['peak_rss_growth_mb'], _difference(_peak_rss_mb(), start_peak_rss))
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, stats):
+        # stats of worker processes are merged into the stats of the parent, times add up over all workers
+        for name, other_stage in stats['stages'].items():
+            stage = self.stages.setdefault(name, {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'peak_rss_growth_mb': None})
+            stage['calls'] = stage['calls'] + other_stage['calls']
+            stage['wall_seconds'] = stage['wall_seconds'] + other_stage['wall_seconds']
+            stage['cpu_seconds'] = stage['cpu_seconds'] + other_stage['cpu_seconds']
+            stage['peak_rss_growth_mb'] = _max(stage['peak_rss_growth_mb'], other_stage['peak_rss_growth_mb'])
+
+        for name, value in stats['counters'].items():
+            self.count(name, value)
+
+    def as_dict(self):
+        return {
+            'stages': self.stages,
+            'counters': self.counters
+        }
+
+    def write(self, stats_filename):
+        with open(stats_filename, 'w') as stats_file:
+            json.dump(self.as_dict(), stats_file, indent=4)
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+
+    # the maximum resident set size is reported in kilobytes on Linux, but in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak_rss / (1024.0 * 1024.0)
+    else:
+        return peak_rss / 1024.0
+
+def _difference(a, b):
+    if a is None or b is None:
+        return None
+    else:
+        return a - b
+
+def _max(a, b):
+    if a is None:
+        return b
+    elif b is None:
+        return a
+    else:
+        return max(a, b)
@@ -0,0 +1,261 @@
+import click
+import logging
+import math
+import os
+import random
+
+from vdv2geojson.x10 import create_x10_file
+
+########################################################################################################################
+# Helper functions for generating deterministic synthetic VDV 452 datasets, e.g. for benchmarks.
+########################################################################################################################
+
+EARTH_RADIUS = 6371008.8
+
+REC_ORT_LAYOUT = [
+    ('BASIS_VERSION', 'num', '9.0'),
+    ('ONR_TYP_NR', 'num', '2.0'),
+    ('ORT_NR', 'num', '6.0'),
+    ('ORT_NAME', 'char', '40'),
+    ('ORT_REF_ORT', 'num', '6.0'),
+    ('ORT_REF_ORT_TYP', 'num', '2.0'),
+    ('ORT_REF_ORT_LANGNR', 'num', '6.0'),
+    ('ORT_REF_ORT_KUERZEL', 'char', '8'),
+    ('ORT_REF_ORT_NAME', 'char', '40'),
+    ('ZONE_WABE_NR', 'num', '5.0'),
+    ('ORT_POS_LAENGE', 'num', '10.0'),
+    ('ORT_POS_BREITE', 'num', '10.0'),
+    ('ORT_POS_HOEHE', 'num', '5.0'),
+    ('ORT_RICHTUNG', 'num', '3.0'),
+    ('HST_NR_INTERNATIONAL', 'char', '30')
+]
+
+REC_SEL_LAYOUT = [
+    ('BASIS_VERSION', 'num', '9.0'),
+    ('BEREICH_NR', 'num', '3.0'),
+    ('ONR_TYP_NR', 'num', '2.0'),
+    ('ORT_NR', 'num', '6.0'),
+    ('SEL_ZIEL', 'num', '6.0'),
+    ('SEL_ZIEL_TYP', 'num', '2.0'),
+    ('SEL_LAENGE', 'num', '5.0')
+]
+
+REC_SEL_ZP_LAYOUT = [
+    ('BASIS_VERSION', 'num', '9.0'),
+    ('BEREICH_NR', 'num', '3.0'),
+    ('ONR_TYP_NR', 'num', '2.0'),
+    ('ORT_NR', 'num', '6.0'),
+    ('SEL_ZIEL', 'num', '6.0'),
+    ('SEL_ZIEL_TYP', 'num', '2.0'),
+    ('ZP_ONR', 'num', '6.0'),
+    ('ZP_TYP', 'num', '2.0'),
+    ('SEL_ZP_LAENGE', 'num', '5.0')
+]
+
+REC_LID_LAYOUT = [
+    ('BASIS_VERSION', 'num', '9.0'),
+    ('LI_NR', 'num', '6.0'),
+    ('STR_LI_VAR', 'char', '6'),
+    ('ROUTEN_NR', 'num', '4.0'),
+    ('LI_RI_NR', 'num', '1.0'),
+    ('BEREICH_NR', 'num', '3.0'),
+    ('LI_KUERZEL', 'char', '6'),
+    ('LIDNAME', 'char', '40'),
+    ('ROUTEN_ART', 'num', '1.0'),
+    ('LINIEN_CODE', 'num', '2.0'),
+    ('LinienID', 'char', '30')
+]
+
+LID_VERLAUF_LAYOUT = [
+    ('BASIS_VERSION', 'num', '9.0'),
+    ('LI_LFD_NR', 'num', '3.0'),
+    ('LI_NR', 'num', '6.0'),
+    ('STR_LI_VAR', 'char', '6'),
+    ('ONR_TYP_NR', 'num', '2.0'),
+    ('ORT_NR', 'num', '6.0'),
+    ('ZNR_NR', 'num', '3.0'),
+    ('ANR_NR', 'num', '3.0'),
+    ('EINFANGBEREICH', 'num', '2.0'),
+    ('LI_KNOTEN', 'boolean', None),
+    ('PRODUKTIV', 'boolean', None)
+]
+
+# records with the same primary key are only added once
+REC_ORT_KEY = ['ONR_TYP_NR', 'ORT_NR']
+REC_SEL_KEY = ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL']
+REC_SEL_ZP_KEY = ['ONR_TYP_NR', 'ORT_NR', 'SEL_ZIEL_TYP', 'SEL_ZIEL', 'ZP_TYP', 'ZP_ONR']
+REC_LID_KEY = ['LI_NR', 'STR_LI_VAR']
+LID_VERLAUF_KEY = ['LI_NR', 'STR_LI_VAR', 'LI_LFD_NR']
+
+STOP_POINT_TYPE = 1
+SHAPE_POINT_TYPE = 2
+
+def generate_dataset(output_directory, num_stops=1000, num_sections=3000, num_shape_points=10, num_lines=50, num_route_variants=4, num_route_stops=20, seed=1):
+    random_generator = random.Random(seed)
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    # stops are placed on a jittered grid, sections connect neighbouring stops in both directions
+    grid_size = max(2, math.ceil(math.sqrt(num_stops)))
+
+    stop_positions = dict()
+    for i in range(num_stops):
+        lon = 9.0 + ((i % grid_size) + random_generator.uniform(-0.3, 0.3)) * 0.005
+        lat = 48.5 + ((i // grid_size) + random_generator.uniform(-0.3, 0.3)) * 0.0035
+
+        stop_positions[i + 1] = (lon, lat)
+
+    candidate_sections = list()
+    for i in range(num_stops):
+        for neighbour in (i + 1, i + grid_size):
+            if neighbour < num_stops and (neighbour != i + 1 or neighbour % grid_size != 0):
+                candidate_sections.append((i + 1, neighbour + 1))
+                candidate_sections.append((neighbour + 1, i + 1))
+
+    random_generator.shuffle(candidate_sections)
+    sections = sorted(candidate_sections[:num_sections])
+
+    next_stops = dict()
+    for start_stop, end_stop in sections:
+        next_stops.setdefault(start_stop, list()).append(end_stop)
+
+    logging.info(f"generating {num_stops} stops, {len(sections)} sections and {num_lines * num_route_variants} routes in {output_directory} ...")
+
+    # REC_ORT contains stops and shape points, REC_SEL and REC_SEL_ZP describe the sections between stops
+    rec_ort = _create_table('REC_ORT', REC_ORT_LAYOUT, REC_ORT_KEY)
+    rec_sel = _create_table('REC_SEL', REC_SEL_LAYOUT, REC_SEL_KEY)
+    rec_sel_zp = _create_table('REC_SEL_ZP', REC_SEL_ZP_LAYOUT, REC_SEL_ZP_KEY)
+
+    for stop_nr, (lon, lat) in stop_positions.items():
+        international_id = f"de:08111:{stop_nr}" if stop_nr % 3 > 0 else ''
+        _add_point(rec_ort, STOP_POINT_TYPE, stop_nr, f"Stop {stop_nr}", lon, lat, international_id)
+
+    shape_point_nr = num_stops
+    for start_stop, end_stop in sections:
+        start_position = stop_positions[start_stop]
+        end_position = stop_positions[end_stop]
+
+        section_points = [start_position]
+        for i in range(random_generator.randint(0, num_shape_points)):
+            shape_point_nr = shape_point_nr + 1
+
+            t = (i + 1) / (num_shape_points + 1)
+            lon = start_position[0] + (end_position[0] - start_position[0]) * t + random_generator.uniform(-0.0002, 0.0002)
+            lat = start_position[1] + (end_position[1] - start_position[1]) * t + random_generator.uniform(-0.0002, 0.0002)
+
+            _add_point(rec_ort, SHAPE_POINT_TYPE, shape_point_nr, '', lon, lat, '')
+            _add_section_point(rec_sel_zp, start_stop, end_stop, SHAPE_POINT_TYPE, shape_point_nr)
+
+            section_points.append((lon, lat))
+
+        # sections with intermediate points end with the end stop, sections without any use the end stop implicitly
+        if len(section_points) > 1:
+            _add_section_point(rec_sel_zp, start_stop, end_stop, STOP_POINT_TYPE, end_stop)
+
+        section_points.append(end_position)
+
+        section_length = sum(_distance(a, b) for a, b in zip(section_points, section_points[1:]))
+        rec_sel.add_record(dict(zip(rec_sel.attributes, [1, 1, STOP_POINT_TYPE, start_stop, end_stop, STOP_POINT_TYPE, round(section_length)])), REC_SEL_KEY)
+
+    # each route variant is a random walk along the sections, never visiting a stop twice
+    rec_lid = _create_table('REC_LID', REC_LID_LAYOUT, REC_LID_KEY)
+    lid_verlauf = _create_table('LID_VERLAUF', LID_VERLAUF_LAYOUT, LID_VERLAUF_KEY)
+
+    route_nr = 0
+    for line_nr in range(1, num_lines + 1):
+        for variant in range(1, num_route_variants + 1):
+            route_nr = route_nr + 1
+            route_stops = [random_generator.choice(list(next_stops.keys()))]
+            while len(route_stops) < num_route_stops:
+                candidates = [s for s in next_stops.get(route_stops[-1], list()) if s not in route_stops]
+                if len(candidates) == 0:
+                    break
+
+                route_stops.append(random_generator.choice(candidates))
+
+            rec_lid.add_record(dict(zip(rec_lid.attributes, [1, line_nr, str(variant), route_nr, 1 + variant % 2, 1, str(line_nr), f"Line {line_nr}", 1, 0, f"de:L{line_nr}"])), REC_LID_KEY)
+
+            for i, stop_nr in enumerate(route_stops):
+                lid_verlauf.add_record(dict(zip(lid_verlauf.attributes, [1, i + 1, line_nr, str(variant), STOP_POINT_TYPE, stop_nr, 0, 0, 0, 0, 1])), LID_VERLAUF_KEY)
+
+    for x10_file in (rec_ort, rec_sel, rec_sel_zp, rec_lid, lid_verlauf):
+        x10_file.write(os.path.join(output_directory, f"{x10_file.table_name}.x10"))
+
+def _create_table(table_name, layout, primary_key):
+    x10_file = create_x10_file(None)
+    x10_file.encoding = 'iso-8859-1'
+
+    # fixed header values, so that the same parameters always generate identical files
+    x10_file.date_format = 'DD.MM.YYYY'
+    x10_file.time_format = 'HH:MM:SS'
+    x10_file.representation = 'free'
+    x10_file.creator_name = 'vdv2geojson'
+    x10_file.creation_date = '01.01.2024'
+    x10_file.creation_time = '00:00:00'
+    x10_file.charset = 'ISO8859-1'
+    x10_file.file_version = '1.4'
+    x10_file.interface_version = '1.4'
+    x10_file.data_version = '1.4'
+    x10_file.file_format = 'VDV452'
+    x10_file.table_name = table_name
+
+    for attribute, datatype, size in layout:
+        x10_file.attributes.append(attribute)
+        x10_file.datatypes.append({'type': datatype, 'size': size})
+
+    # records are de-duplicated by their primary key when added, which is only fast with an index on it
+    x10_file.create_index(primary_key)
+
+    return x10_file
+
+def _add_point(rec_ort, point_type, point_nr, name, lon, lat, international_id):
+    rec_ort.add_record(dict(zip(rec_ort.attributes, [
+        1, point_type, point_nr, name, point_nr, point_type, point_nr, '', name, 100,
+        _create_coordinate_vdv(lon), _create_coordinate_vdv(lat), 0, 0, international_id
+    ])), REC_ORT_KEY)
+
+def _add_section_point(rec_sel_zp, start_stop, end_stop, point_type, point_nr):
+    rec_sel_zp.add_record(dict(zip(rec_sel_zp.attributes, [
+        1, 1, STOP_POINT_TYPE, start_stop, end_stop, STOP_POINT_TYPE, point_nr, point_type, 0
+    ])), REC_SEL_ZP_KEY)
+
+def _create_coordinate_vdv(value):
+    # DDDMMSSsss with milliseconds of arc, the inverse of the coordinate conversion in the dialects
+    milliseconds = round(abs(value) * 3600000.0)
+
+    degrees = milliseconds // 3600000
+    minutes = (milliseconds // 60000) % 60
+    seconds = milliseconds % 60000
+
+    coordinate = degrees * 10000000 + minutes * 100000 + seconds
+
+    return -coordinate if value < 0 else coordinate
+
+def _distance(a, b):
+    reference_latitude = math.radians((a[1] + b[1]) / 2.0)
+
+    dx = math.radians(b[0] - a[0]) * EARTH_RADIUS * math.cos(reference_latitude)
+    dy = math.radians(b[1] - a[1]) * EARTH_RADIUS
+
+    return math.sqrt(dx * dx + dy * dy)
+
+@click.command
+@click.option('--output', default='./input', help='output directory for the generated X10 files')
+@click.option('--stops', default=1000, type=int, help='number of stops')
+@click.option('--sections', default=3000, type=int, help='number of sections between neighbouring stops')
+@click.option('--shape-points', default=10, type=int, help='maximum number of shape points per section')
+@click.option('--lines', default=50, type=int, help='number of lines')
+@click.option('--variants', default=4, type=int, help='number of route variants per line')
+@click.option('--route-stops', default=20, type=int, help='maximum number of stops per route variant')
+@click.option('--seed', default=1, type=int, help='seed of the random generator')
+def main(output, stops, sections, shape_points, lines, variants, route_stops, seed):
+    generate_dataset(output, stops, sections, shape_points, lines, variants, route_stops, seed)
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format= '[%(asctime)s] %(levelname)s: %(message)s',
+        datefmt='%H:%M:%S'
+    )
+
+    main()
@@ -0,0 +1,194 @@
+import math
+import numpy
+
+from vdv2geojson.geojson import GeoJsonFeatureCollectionWriter
+from vdv2geojson.simplify import simplify_linestring
+
+########################################################################################################################
+# Helper classes for clipping route shapes into a z/x/y pyramid of compact GeoJSON tiles.
+########################################################################################################################
+
+# latitudes beyond this limit are not covered by web mercator tiles
+MAX_LATITUDE = 85.0511287798066
+
+TILE_SIZE = 256
+
+class TilePyramidWriter:
+
+    def __init__(self, open_file, min_zoom=8, max_zoom=14, tolerance_pixels=1.0, buffer_pixels=4, directory='tiles', coordinate_precision=None, algorithm='douglas-peucker'):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.tolerance_pixels = tolerance_pixels
+        self.buffer_pixels = buffer_pixels
+        self.directory = directory
+        self.coordinate_precision = coordinate_precision
+        self.algorithm = algorithm
+
+        self.filenames = list()
+        self.num_bytes = 0
+
+        self._open_file = open_file
+        self._features = list()
+
+    def write_feature(self, feature):
+        # tiles are only written when all routes are known, as every tile may contain parts of many routes
+        # intermediate stops are left out, they would be repeated in every tile a route passes
+        properties = {k: v for k, v in feature['properties'].items() if k != 'intermediate_stops'}
+        self._features.append((feature['geometry']['coordinates'], properties))
+
+    def encode_feature(self, feature):
+        return feature
+
+    def write_encoded_feature(self, encoded_feature):
+        self.write_feature(encoded_feature)
+
+    def close(self):
+        # tiles of one zoom level are kept in memory at once
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            tolerance = self.tolerance_pixels * 360.0 / (TILE_SIZE * (2 ** zoom))
+
+            tiles = dict()
+            for coordinates, properties in self._features:
+                simplified_coordinates = simplify_linestring(coordinates, tolerance, self.algorithm, 'degrees')
+                for tile, parts in clip_linestring(simplified_coordinates, zoom, self.buffer_pixels / TILE_SIZE).items():
+                    tiles.setdefault(tile, list()).append(_create_tile_feature(parts, properties))
+
+            for (x, y), features in sorted(tiles.items()):
+                self._write_tile(f"{self.directory}/{zoom}/{x}/{y}.geojson", features)
+
+        self._features = list()
+
+    def _write_tile(self, tile_filename, features):
+        with self._open_file(tile_filename) as tile_file:
+            tile_writer = GeoJsonFeatureCollectionWriter(tile_file, True, self.coordinate_precision)
+            for feature in features:
+                tile_writer.write_feature(feature)
+
+            tile_writer.close()
+
+        self.filenames.append(tile_filename)
+        self.num_bytes = self.num_bytes + tile_writer.num_bytes
+
+def clip_linestring(coordinates, zoom, buffer=0.0):
+    # returns the parts of the line within each tile, the buffer is given as a fraction of the tile size
+    num_tiles = 2 ** zoom
+
+    points = numpy.asarray(coordinates, dtype=numpy.float64).reshape(-1, 2)
+    xs, ys = _project(points[:, 0], points[:, 1], num_tiles)
+
+    tiles = dict()
+    open_parts = dict()
+    for i in range(len(points) - 1):
+        x0, y0, x1, y1 = xs[i], ys[i], xs[i + 1], ys[i + 1]
+
+        min_tile_x = max(0, math.floor(min(x0, x1) - buffer))
+        max_tile_x = min(num_tiles - 1, math.floor(max(x0, x1) + buffer))
+        min_tile_y = max(0, math.floor(min(y0, y1) - buffer))
+        max_tile_y = min(num_tiles - 1, math.floor(max(y0, y1) + buffer))
+
+        # most segments lie within a single tile including its buffer and do not need to be clipped
+        if min_tile_x == max_tile_x and min_tile_y == max_tile_y:
+            part = open_parts.get((min_tile_x, min_tile_y))
+            if part is None:
+                part = [list(coordinates[i])]
+                tiles.setdefault((min_tile_x, min_tile_y), list()).append(part)
+
+            part.append(list(coordinates[i + 1]))
+
+            open_parts = {(min_tile_x, min_tile_y): part}
+            continue
+
+        segment_parts = dict()
+        for tile_x in range(min_tile_x, max_tile_x + 1):
+            # only the rows of tiles the segment passes within this column are checked
+            column = _clip_segment(x0, y0, x1, y1, tile_x - buffer, -math.inf, tile_x + 1 + buffer, math.inf)
+            if column is None:
+                continue
+
+            column_y0 = y0 + column[0] * (y1 - y0)
+            column_y1 = y0 + column[1] * (y1 - y0)
+            column_min_tile_y = max(min_tile_y, math.floor(min(column_y0, column_y1) - buffer))
+            column_max_tile_y = min(max_tile_y, math.floor(max(column_y0, column_y1) + buffer))
+
+            for tile_y in range(column_min_tile_y, column_max_tile_y + 1):
+                clipped = _clip_segment(x0, y0, x1, y1, tile_x - buffer, tile_y - buffer, tile_x + 1 + buffer, tile_y + 1 + buffer)
+                if clipped is None:
+                    continue
+
+                t0, t1 = clipped
+
+                # vertices within the tile are kept as they are, only points on the tile border are computed
+                start = list(coordinates[i]) if t0 == 0.0 else _unproject(x0 + t0 * (x1 - x0), y0 + t0 * (y1 - y0), num_tiles)
+                end = list(coordinates[i + 1]) if t1 == 1.0 else _unproject(x0 + t1 * (x1 - x0), y0 + t1 * (y1 - y0), num_tiles)
+
+                # a segment starting in the tile continues the part of the previous segment, otherwise it enters the tile
+                part = open_parts.get((tile_x, tile_y)) if t0 == 0.0 else None
+                if part is None:
+                    part = [start]
+                    tiles.setdefault((tile_x, tile_y), list()).append(part)
+
+                part.append(end)
+
+                if t1 == 1.0:
+                    segment_parts[(tile_x, tile_y)] = part
+
+        open_parts = segment_parts
+
+    return tiles
+
+def _create_tile_feature(parts, properties):
+    if len(parts) == 1:
+        geometry = {
+            'type': 'LineString',
+            'coordinates': parts[0]
+        }
+    else:
+        geometry = {
+            'type': 'MultiLineString',
+            'coordinates': parts
+        }
+
+    return {
+        'type': 'Feature',
+        'geometry': geometry,
+        'properties': properties
+    }
+
+def _clip_segment(x0, y0, x1, y1, min_x, min_y, max_x, max_y):
+    # Liang-Barsky, returns the parameters of the clipped segment or None if it does not touch the rectangle
+    dx = x1 - x0
+    dy = y1 - y0
+
+    t0 = 0.0
+    t1 = 1.0
+    for p, q in ((-dx, x0 - min_x), (dx, max_x - x0), (-dy, y0 - min_y), (dy, max_y - y0)):
+        if p == 0.0:
+            if q < 0.0:
+                return None
+        elif p < 0.0:
+            t0 = max(t0, q / p)
+        else:
+            t1 = min(t1, q / p)
+
+        if t0 > t1:
+            return None
+
+    # segments only touching the rectangle in a single point are left out
+    if t0 == t1 and (dx != 0.0 or dy != 0.0):
+        return None
+
+    return t0, t1
+
+def _project(longitudes, latitudes, num_tiles):
+    latitudes = numpy.radians(numpy.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+
+    xs = (longitudes + 180.0) / 360.0 * num_tiles
+    ys = (1.0 - numpy.log(numpy.tan(latitudes) + 1.0 / numpy.cos(latitudes)) / math.pi) / 2.0 * num_tiles
+
+    return xs.tolist(), ys.tolist()
+
+def _unproject(x, y, num_tiles):
+    longitude = x / num_tiles * 360.0 - 180.0
+    latitude = math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / num_tiles))))
+
+    return [longitude, latitude]
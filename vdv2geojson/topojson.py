@@ -0,0 +1,84 @@
+import json
+import numpy
+
+from vdv2geojson.geojson import write_json_text
+
+########################################################################################################################
+# Helper class for writing routes as a TopoJSON topology, storing each shared section geometry only once as an arc.
+########################################################################################################################
+
+class TopologyWriter:
+
+    def __init__(self, topojson_file, quantization=1000000, object_name='routes'):
+        self.quantization = quantization
+        self.object_name = object_name
+
+        self._topojson_file = topojson_file
+
+        self._arcs = list()
+        self._arc_indices = dict()
+        self._geometries = list()
+
+        self.num_bytes = 0
+
+    def write_feature(self, feature):
+        # features reference their arcs as pairs of a key and the coordinates, arcs with the same key are stored once
+        arc_indices = list()
+        for arc_key, arc_coordinates in feature['geometry']['arcs']:
+            if arc_key not in self._arc_indices:
+                self._arc_indices[arc_key] = len(self._arcs)
+                self._arcs.append(numpy.asarray(arc_coordinates, dtype=numpy.float64).reshape(-1, 2))
+
+            arc_indices.append(self._arc_indices[arc_key])
+
+        self._geometries.append({
+            'type': 'LineString',
+            'arcs': arc_indices,
+            'properties': feature['properties']
+        })
+
+    def encode_feature(self, feature):
+        return feature
+
+    def write_encoded_feature(self, encoded_feature):
+        self.write_feature(encoded_feature)
+
+    def close(self):
+        # the topology is written once all arcs are known, as the quantization depends on the bounds of all of them
+        if len(self._arcs) > 0:
+            all_coordinates = numpy.concatenate(self._arcs)
+            translate = all_coordinates.min(axis=0)
+            extent = all_coordinates.max(axis=0) - translate
+        else:
+            translate = numpy.zeros(2)
+            extent = numpy.zeros(2)
+
+        scale = numpy.where(extent > 0.0, extent / (self.quantization - 1), 1.0)
+
+        topology = {
+            'type': 'Topology',
+            'transform': {
+                'scale': scale.tolist(),
+                'translate': translate.tolist()
+            },
+            'objects': {
+                self.object_name: {
+                    'type': 'GeometryCollection',
+                    'geometries': self._geometries
+                }
+            },
+            'arcs': [_encode_arc(a, translate, scale) for a in self._arcs]
+        }
+
+        self.num_bytes = self.num_bytes + write_json_text(self._topojson_file, json.dumps(topology, separators=(',', ':')))
+
+        self._arcs = list()
+        self._arc_indices = dict()
+        self._geometries = list()
+
+def _encode_arc(arc_coordinates, translate, scale):
+    # quantized positions are delta-encoded, only the first position of each arc is absolute
+    quantized_coordinates = numpy.rint((arc_coordinates - translate) / scale).astype(numpy.int64)
+    quantized_coordinates[1:] = numpy.diff(quantized_coordinates, axis=0)
+
+    return quantized_coordinates.tolist()
@@ -1,18 +1,35 @@
+import contextlib
 import csv
+import io
+import itertools
 import logging
+import operator
 import re
+import sys
+
+from array import array
+from collections.abc import Mapping
 
 ########################################################################################################################
 # Helper class for reading and modifying *.x10 files.
 ########################################################################################################################
 
-def read_x10_file(filename, null_value='NULL', encoding='utf-8'):
+def read_x10_file(filename, null_value='NULL', encoding='utf-8', columns=None, storage='rows', value_filter=None):
     x10_file = X10File()
     x10_file.null_value = null_value
     x10_file.encoding = encoding
-    x10_file.read(filename)
+    x10_file.storage = storage
+    x10_file.read(filename, columns, value_filter)
     
     return x10_file
+
+
+def iter_x10_records(filename, null_value='NULL', encoding='utf-8', columns=None, value_filter=None):
+    x10_file = X10File()
+    x10_file.null_value = null_value
+    x10_file.encoding = encoding
+    
+    yield from x10_file.iter_records(filename, columns, value_filter)
     
     
 def create_x10_file(filename):
@@ -20,24 +37,73 @@ def create_x10_file(filename):
     
     return x10_file
 
+_MISSING = object()
+
 class X10File:
 
     def __init__(self, filename=None):
         self.null_value = ''
         self.encoding = 'utf-8'
         self.strict = False
+        # indexes are only used once created explicitly, they do not follow records changed in place
+        self.auto_index = False
+        self.storage = 'rows'
         
         self._internal_init()
 
-    def read(self, filename):
-        self._filename = filename
+    def read(self, filename, columns=None, value_filter=None):
+        if self.storage == 'columns':
+            for values in self._iter_values(filename, columns, value_filter):
+                if not isinstance(self.records, X10ColumnTable):
+                    self.records = X10ColumnTable(self.attributes, self.datatypes)
+                    
+                self.records.append_values(values)
+                
+            if not isinstance(self.records, X10ColumnTable):
+                self.records = X10ColumnTable(self.attributes, self.datatypes)
+        else:
+            for record in self.iter_records(filename, columns, value_filter):
+                self.records.append(record)
+            
+        self._rebuild_indexes()
+            
+    def iter_records(self, filename, columns=None, value_filter=None):
+        attributes = None
+        for values in self._iter_values(filename, columns, value_filter):
+            if attributes is None:
+                attributes = tuple(self.attributes)
+                
+            yield dict(zip(attributes, values))
+            
+    def _iter_values(self, filename, columns, value_filter=None):
+        # file-like objects are read as they are, e.g. members opened directly from a ZIP archive
+        if not hasattr(filename, 'read'):
+            self._filename = filename
+        
+        record_layout = None
+        num_records = 0
     
-        with open(self._filename, newline='', encoding=self.encoding) as x10_file:
+        with self._open_x10_file(filename) as x10_file:
             x10_reader = csv.reader(x10_file, delimiter=';', quotechar='"')
             for x10_row in x10_reader:
                 if len(x10_row) > 0:
                 
-                    if x10_row[0] == 'mod':
+                    # records are by far the most frequent rows, check them first
+                    if x10_row[0] == 'rec':
+                        if record_layout is None:
+                            row_filter = self._compile_row_filter(value_filter)
+                            record_layout = self._compile_record_layout(columns)
+                            values_of, converters = record_layout
+                        
+                        num_records = num_records + 1
+                        
+                        # filtered rows are skipped before converting all of their values
+                        if row_filter is not None and not row_filter(x10_row):
+                            continue
+                            
+                        yield [c(v) for c, v in zip(converters, values_of(x10_row))]
+                
+                    elif x10_row[0] == 'mod':
                         self.date_format = x10_row[1].strip().strip('"')
                         self.time_format = x10_row[2].strip().strip('"')
                         self.representation = x10_row[3].strip().strip('"')
@@ -83,36 +149,20 @@ class X10File:
                             else:
                                 self.datatypes.append({'type': dtype_value[0], 'size': None})
                             
-                    elif x10_row[0] == 'rec':
-                        record = dict()
-                        for i, val in enumerate(x10_row[1:]):
-                            val = val.strip().strip('"')
-                            
-                            if val == '""':
-                                val = ''
-                                
-                            dtype = self._dtype_of_fstr(self.datatypes[i]['type'])
-                            if dtype == str:
-                                record[self.attributes[i]] = str(val)
-                            elif dtype == int and val != self.null_value:
-                                record[self.attributes[i]] = int(val)
-                            elif dtype == float and val != self.null_value:
-                                record[self.attributes[i]] = float(val)
-                            else: # boolean is also handled as string here, since it can contain 0/1 or False/True
-                                record[self.attributes[i]] = val
-                               
-                        self.records.append(record)
-                        
                     elif x10_row[0] == 'end':
-                        if not len(self.records) == int(x10_row[1]):
+                        if not num_records == int(x10_row[1]):
                             logging.error("number of records not matching")
                             
                     elif x10_row[0] == 'eof':
                         pass
                         
-    def write(self, filename=None):
+    def write(self, filename=None, records=None, chunk_size=10000):
         if filename == None:
             filename = self._filename
+            
+        # any iterable of records can be written with the layout of this file, e.g. a generator transforming another table
+        if records is None:
+            records = self.records
     
         with open(filename, 'w', newline='', encoding=self.encoding) as x10_file:
             x10_writer = csv.writer(x10_file, delimiter=';', quotechar='*')
@@ -163,26 +213,14 @@ class X10File:
                 
             x10_writer.writerow(f_dtypes)
             
-            # write records
-            f_records = list()
-            for record in self.records:
-                
-                f_record = ['rec']
-                for rkey in record:
-                    
-                    column_index = self.attributes.index(rkey)
-                    
-                    fstr = self.datatypes[column_index]['type']
-                    dtype = self._dtype_of_fstr(fstr)
-                    
-                    f_record.insert(column_index + 1, self._create_value(record[rkey], dtype))
-                    
-                f_records.append(f_record)
+            # write records in chunks, the column layout and value formatters are computed only once
+            num_records = 0
+            for f_records in self._iter_record_chunks(records, chunk_size):
+                x10_writer.writerows(f_records)
+                num_records = num_records + len(f_records)
                 
-            x10_writer.writerows(f_records)
-            
             # write table end
-            x10_writer.writerow(['end', self._create_value(len(self.records), int)])
+            x10_writer.writerow(['end', self._create_value(num_records, int)])
             
             # write file end
             x10_writer.writerow(['eof', self._create_value(1, int)])
@@ -195,8 +233,13 @@ class X10File:
         
         self.datatypes.append({'type': self._fstr_of_dtype(dtype), 'size': fsize})
         
-        for record in self.records:
-            record[cname] = default
+        if isinstance(self.records, X10ColumnTable):
+            self.records.add_column(cname, self.datatypes[-1], default)
+        else:
+            for record in self.records:
+                record[cname] = default
+            
+        self._rebuild_indexes(cname)
             
     def remove_column(self, cname):
         column_index = self.attributes.index(cname)
@@ -204,33 +247,97 @@ class X10File:
         del self.attributes[column_index]
         del self.datatypes[column_index]
         
-        for record in self.records:
-            del record[cname]
+        if isinstance(self.records, X10ColumnTable):
+            self.records.remove_column(cname)
+        else:
+            for record in self.records:
+                del record[cname]
+            
+        self._rebuild_indexes(cname)
+        
+    def create_index(self, primary_key):
+        primary_key = tuple(primary_key)
+        
+        index = dict()
+        if isinstance(self.records, X10ColumnTable):
+            # column tables are indexed by row numbers, the records are only created when they are found
+            for row, key in enumerate(self.records.iter_keys(primary_key)):
+                index.setdefault(key, list()).append(row)
+        else:
+            for record in self.records:
+                index.setdefault(self._create_index_key(record, primary_key), list()).append(record)
+            
+        self._indexes[primary_key] = index
+        
+        return index
+        
+    def drop_index(self, primary_key):
+        self._indexes.pop(tuple(primary_key), None)
             
     def add_record(self, rdata, primary_key=None):
-        record_existing = False
-        record_pkfields = self._create_compare_record(rdata, primary_key)
-        for i in range(len(self.records)):
-            compare_record = self._create_compare_record(self.records[i], primary_key)
+        self.add_records([rdata], primary_key)
             
-            if record_pkfields == compare_record:
-                record_existing = True
-                break
+    def add_records(self, records, primary_key=None):
+        # records are de-duplicated against the existing ones and each other in a single pass over a hash set of their keys
+        key_of = self._compile_key_function(primary_key)
+        
+        index = self._index_of(primary_key)
+        if index is not None:
+            existing_keys = index
+        else:
+            existing_keys = set(key_of(record) for record in self.records)
+            
+        added_keys = set()
+        num_records = len(self.records)
+        for record in records:
+            key = key_of(record)
+            if key in existing_keys or key in added_keys:
+                continue
                 
-        if not record_existing:
-            self.records.append(rdata)
+            added_keys.add(key)
+            self.records.append(record)
             
+        added_records = self.records[num_records:]
+        for index_key, index in self._indexes.items():
+            for row, record in enumerate(added_records, num_records):
+                index.setdefault(self._create_index_key(record, index_key), list()).append(self._index_entry(row, record))
+                
+        return len(added_records)
+        
     def remove_records(self, rdata, primary_key=None):
-        updated_records = list()
-        for i in range(len(self.records)):
-            compare_record = self._create_compare_record(self.records[i], primary_key)
+        # rdata is either a single record or an iterable of records, all of them are removed in a single pass
+        if isinstance(rdata, Mapping):
+            rdata = [rdata]
             
-            if rdata != compare_record:
-                updated_records.append(self.records[i])
-                
-        self.records = updated_records 
+        if primary_key is not None:
+            # rdata is compared as is, so it can only match if it consists of primary key fields only
+            rdata = [r for r in rdata if all(k in primary_key for k in r)]
+            
+        key_of = self._compile_key_function(primary_key)
+        
+        removed_keys = set(key_of(r) for r in rdata)
+        if len(removed_keys) == 0:
+            return 0
+            
+        num_records = len(self.records)
+        
+        if isinstance(self.records, X10ColumnTable) or len(self._indexes) > 0:
+            retained_rows = [i for i, record in enumerate(self.records) if key_of(record) not in removed_keys]
+            
+            # indexes refer to the records of the current table, so it is only replaced if anything was removed
+            if len(retained_rows) < num_records:
+                self._retain_rows(retained_rows)
+                self._rebuild_indexes()
+        else:
+            self.records = [record for record in self.records if key_of(record) not in removed_keys]
+            
+        return num_records - len(self.records)
 
     def find_records(self, rdata, primary_key=None):
+        index = self._index_of(primary_key)
+        if index is not None:
+            return self._indexed_records(index.get(self._create_index_key(rdata, primary_key), list()))
+    
         rdata = self._create_compare_record(rdata, primary_key)
         
         result_records = list()
@@ -243,6 +350,11 @@ class X10File:
         return result_records
     
     def find_record(self, rdata, primary_key=None):
+        index = self._index_of(primary_key)
+        if index is not None:
+            result_records = index.get(self._create_index_key(rdata, primary_key))
+            return self._indexed_records(result_records[:1])[0] if result_records else None
+    
         rdata = self._create_compare_record(rdata, primary_key)
         
         for i in range(len(self.records)):
@@ -252,18 +364,25 @@ class X10File:
                 return self.records[i]
             
     def replace_foreign_keys(self, foreign_key_columns, repl_map):
-        for i in range(len(self.records)):
-            original_record = self.records[i]
-            updated_record = dict(original_record)
-            
-            updated = False
+        # values are replaced in place in a single pass, only indexes on changed columns are rebuilt afterwards
+        updated_columns = set()
+        
+        if isinstance(self.records, X10ColumnTable):
             for fkc in foreign_key_columns:
-                if original_record[fkc] in repl_map:
-                    updated_record[fkc] = repl_map[original_record[fkc]]
-                    updated = True
-                    
-            if updated:
-                self.records[i] = updated_record
+                if self.records.replace_values(fkc, repl_map) > 0:
+                    updated_columns.add(fkc)
+        else:
+            for record in self.records:
+                for fkc in foreign_key_columns:
+                    value = record[fkc]
+                    if value in repl_map:
+                        record[fkc] = repl_map[value]
+                        updated_columns.add(fkc)
+                        
+        for cname in updated_columns:
+            self._rebuild_indexes(cname)
+            
+        return len(updated_columns) > 0
             
     def close(self):
         self._internal_init()
@@ -287,6 +406,8 @@ class X10File:
         self.attributes = list()
         self.datatypes = list()
         self.records = list()
+        
+        self._indexes = dict()
                           
             
     def _create_value(self, val, dtype=str):
@@ -314,6 +435,151 @@ class X10File:
         else:
             return 'num'
         
+    @contextlib.contextmanager
+    def _open_x10_file(self, filename):
+        if isinstance(filename, io.TextIOBase):
+            yield filename
+        elif hasattr(filename, 'read'):
+            x10_file = io.TextIOWrapper(filename, encoding=self.encoding, newline='')
+            try:
+                yield x10_file
+            finally:
+                # leave closing the binary stream to its owner
+                x10_file.detach()
+        else:
+            with open(filename, newline='', encoding=self.encoding) as x10_file:
+                yield x10_file
+                
+    def _iter_record_chunks(self, records, chunk_size):
+        formatters = [self._compile_formatter(datatype['type']) for datatype in self.datatypes]
+        
+        if isinstance(records, X10ColumnTable):
+            rows = records.iter_values(self.attributes)
+        else:
+            rows = self._iter_record_values(records)
+            
+        f_records = list()
+        for values in rows:
+            f_records.append(['rec'] + [f(v) for f, v in zip(formatters, values)])
+            
+            if len(f_records) >= chunk_size:
+                yield f_records
+                f_records = list()
+                
+        if len(f_records) > 0:
+            yield f_records
+            
+    def _iter_record_values(self, records):
+        if len(self.attributes) > 1:
+            values_of = operator.itemgetter(*self.attributes)
+        else:
+            values_of = lambda record: tuple(record[attribute] for attribute in self.attributes)
+            
+        for record in records:
+            try:
+                yield values_of(record)
+            except KeyError:
+                # missing columns are written as empty values
+                yield [record[attribute] if attribute in record else '' for attribute in self.attributes]
+            
+    def _compile_formatter(self, fstr):
+        # same representation as _create_value
+        if self._dtype_of_fstr(fstr) == str:
+            return lambda val: f" \"{val}\""
+        else:
+            return lambda val: f" {val}"
+            
+    def _compile_row_filter(self, value_filter):
+        if value_filter is None:
+            return None
+            
+        # value_filter maps attributes to their allowed values, rows must match all of them
+        conditions = list()
+        for attribute, allowed_values in value_filter.items():
+            i = self.attributes.index(attribute)
+            conditions.append((i + 1, self._compile_converter(self.datatypes[i]['type']), allowed_values))
+            
+        return lambda x10_row: all(c(x10_row[i]) in allowed_values for i, c, allowed_values in conditions)
+        
+    def _compile_record_layout(self, columns):
+        column_indices = list()
+        for i, attribute in enumerate(self.attributes):
+            if columns is None or attribute in columns:
+                column_indices.append(i)
+                
+        if len(column_indices) == len(self.attributes):
+            values_of = lambda x10_row: x10_row[1:]
+        elif len(column_indices) > 1:
+            values_of = operator.itemgetter(*[i + 1 for i in column_indices])
+        else:
+            value_indices = [i + 1 for i in column_indices]
+            values_of = lambda x10_row: [x10_row[i] for i in value_indices]
+            
+        # keep attributes and datatypes consistent with the projected records
+        self.attributes = [self.attributes[i] for i in column_indices]
+        self.datatypes = [self.datatypes[i] for i in column_indices]
+            
+        converters = tuple(self._compile_converter(datatype['type']) for datatype in self.datatypes)
+            
+        return values_of, converters
+        
+    def _compile_converter(self, fstr):
+        null_value = self.null_value
+        dtype = self._dtype_of_fstr(fstr)
+        
+        if dtype == int or dtype == float:
+            def convert(val):
+                val = val.strip().strip('"')
+                return val if val == null_value else dtype(val)
+        else: # boolean is also handled as string here, since it can contain 0/1 or False/True
+            def convert(val):
+                return val.strip().strip('"')
+            
+        return convert
+        
+    def _index_of(self, primary_key):
+        if primary_key is None:
+            return None
+            
+        primary_key = tuple(primary_key)
+        if primary_key in self._indexes:
+            return self._indexes[primary_key]
+        elif self.auto_index:
+            return self.create_index(primary_key)
+        else:
+            return None
+            
+    def _retain_rows(self, rows):
+        if isinstance(self.records, X10ColumnTable):
+            self.records = self.records.select(rows)
+        else:
+            self.records = [self.records[i] for i in rows]
+            
+    def _rebuild_indexes(self, cname=None):
+        for primary_key in list(self._indexes.keys()):
+            if cname is None or cname in primary_key:
+                self.create_index(primary_key)
+                
+    def _index_entry(self, row, record):
+        return row if isinstance(self.records, X10ColumnTable) else record
+        
+    def _indexed_records(self, entries):
+        if isinstance(self.records, X10ColumnTable):
+            return [X10RecordView(self.records, row) for row in entries]
+        else:
+            return list(entries)
+            
+    def _compile_key_function(self, primary_key):
+        if primary_key is not None:
+            primary_key = tuple(primary_key)
+            return lambda record: self._create_index_key(record, primary_key)
+        else:
+            # without a primary key whole records are compared
+            return lambda record: frozenset(record.items())
+            
+    def _create_index_key(self, record, primary_key):
+        return tuple(record.get(k, _MISSING) for k in primary_key)
+        
     def _create_compare_record(self, record, primary_key):
     
         if primary_key is not None:
@@ -326,3 +592,162 @@ class X10File:
             return compare_record
         else:
             return record
+
+
+class X10ColumnTable:
+
+    def __init__(self, attributes, datatypes):
+        self.attributes = list()
+        
+        self._columns = list()
+        self._column_indices = dict()
+        self._length = 0
+        
+        for attribute, datatype in zip(attributes, datatypes):
+            self._append_column(attribute, self._create_column(datatype))
+            
+    def __len__(self):
+        return self._length
+        
+    def __iter__(self):
+        for i in range(self._length):
+            yield X10RecordView(self, i)
+            
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [X10RecordView(self, r) for r in range(*i.indices(self._length))]
+            
+        if i < 0:
+            i = i + self._length
+            
+        if i < 0 or i >= self._length:
+            raise IndexError('record index out of range')
+            
+        return X10RecordView(self, i)
+        
+    def __setitem__(self, i, record):
+        for attribute in record:
+            self.set_value(i, attribute, record[attribute])
+            
+    def append(self, record):
+        self.append_values([record[attribute] if attribute in record else '' for attribute in self.attributes])
+        
+    def append_values(self, values):
+        for c, column in enumerate(self._columns):
+            value = values[c] if c < len(values) else ''
+            if value.__class__ is str:
+                value = sys.intern(value)
+                
+            try:
+                column.append(value)
+            except (TypeError, OverflowError):
+                # typed arrays cannot hold null values or out of range numbers, fall back to a plain list
+                column = self._columns[c] = list(column)
+                column.append(value)
+                
+        self._length = self._length + 1
+        
+    def iter_values(self, attributes):
+        return zip(*[self._columns[self._column_indices[attribute]] for attribute in attributes])
+        
+    def iter_keys(self, attributes):
+        # like iter_values, but missing attributes are yielded as missing values instead of raising a KeyError
+        return zip(*[
+            self._columns[self._column_indices[attribute]] if attribute in self._column_indices else itertools.repeat(_MISSING, self._length)
+            for attribute in attributes
+        ])
+        
+    def replace_values(self, attribute, repl_map):
+        c = self._column_indices[attribute]
+        
+        num_replaced = 0
+        for i, value in enumerate(self._columns[c]):
+            if value in repl_map:
+                self.set_value(i, attribute, repl_map[value])
+                num_replaced = num_replaced + 1
+                
+        return num_replaced
+        
+    def get_value(self, i, attribute):
+        return self._columns[self._column_indices[attribute]][i]
+        
+    def set_value(self, i, attribute, value):
+        c = self._column_indices[attribute]
+        if value.__class__ is str:
+            value = sys.intern(value)
+            
+        try:
+            self._columns[c][i] = value
+        except (TypeError, OverflowError):
+            self._columns[c] = list(self._columns[c])
+            self._columns[c][i] = value
+            
+    def select(self, rows):
+        table = X10ColumnTable([], [])
+        
+        for attribute, column in zip(self.attributes, self._columns):
+            if isinstance(column, array):
+                table._append_column(attribute, array(column.typecode, [column[i] for i in rows]))
+            else:
+                table._append_column(attribute, [column[i] for i in rows])
+                
+        table._length = len(rows)
+                
+        return table
+        
+    def add_column(self, attribute, datatype, default=''):
+        column = self._create_column(datatype)
+        
+        try:
+            column.extend([default] * self._length)
+        except (TypeError, OverflowError):
+            column = [default] * self._length
+            
+        self._append_column(attribute, column)
+        
+    def remove_column(self, attribute):
+        c = self._column_indices[attribute]
+        
+        del self.attributes[c]
+        del self._columns[c]
+        
+        self._column_indices = {a: i for i, a in enumerate(self.attributes)}
+        
+    def _append_column(self, attribute, column):
+        self._column_indices[attribute] = len(self.attributes)
+        
+        self.attributes.append(attribute)
+        self._columns.append(column)
+        
+    def _create_column(self, datatype):
+        if datatype['type'] not in ('char', 'boolean'):
+            return array('q')
+        else:
+            return list()
+            
+
+class X10RecordView(Mapping):
+    
+    __slots__ = ('_table', 'row')
+    
+    def __init__(self, table, row):
+        self._table = table
+        self.row = row
+        
+    def __getitem__(self, key):
+        return self._table.get_value(self.row, key)
+        
+    def __setitem__(self, key, value):
+        self._table.set_value(self.row, key, value)
+        
+    def __contains__(self, key):
+        return key in self._table._column_indices
+        
+    def __iter__(self):
+        return iter(self._table.attributes)
+        
+    def __len__(self):
+        return len(self._table.attributes)
+        
+    def __repr__(self):
+        return repr(dict(self))